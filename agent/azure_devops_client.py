@@ -0,0 +1,343 @@
+import asyncio
+import os
+import random
+import re
+import threading
+import time
+import weakref
+from collections import defaultdict
+from email.utils import parsedate_to_datetime
+
+import requests
+from requests.adapters import HTTPAdapter
+
+DEFAULT_TIMEOUT = 30  # Seconds, applied to every request that doesn't pass its own
+MAX_RETRIES = 5
+BACKOFF_BASE = 1.0  # Seconds, doubled on every attempt
+BACKOFF_MAX = 60.0  # Upper bound for a single wait, also caps Retry-After
+RETRY_STATUS_CODES = {429, 503}
+IDEMPOTENT_METHODS = {"GET", "HEAD", "PUT", "DELETE", "OPTIONS"}
+DEFAULT_BASE_URL = "https://dev.azure.com"
+
+
+def azure_devops_base_url() -> str:
+    """
+    Returns the Azure DevOps service URL, overridable with AZURE_DEVOPS_BASE_URL
+    (e.g. for Azure DevOps Server or a local stand-in).
+    """
+    return os.environ.get("AZURE_DEVOPS_BASE_URL", DEFAULT_BASE_URL).rstrip("/")
+
+
+def endpoint_name(method: str, url: str) -> str:
+    """
+    Builds a stable label for a request, e.g. "GET wit/workitems/{id}",
+    so that metrics are grouped per endpoint and not per work item.
+    """
+    path = url.split("?", 1)[0]
+    if "/_apis/" in path:
+        path = path.split("/_apis/", 1)[1]
+    path = re.sub(r"/\d+(?=/|$)", "/{id}", path)
+    path = re.sub(r"/[0-9a-fA-F-]{36}(?=/|$)", "/{guid}", path)
+    return f"{method.upper()} {path.lower()}"
+
+
+def _retry_after_seconds(response: requests.Response) -> float | None:
+    value = response.headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class EndpointStats:
+    def __init__(self):
+        self.calls = 0
+        self.retries = 0
+        self.errors = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+
+    def as_dict(self) -> dict:
+        return {
+            "calls": self.calls,
+            "retries": self.retries,
+            "errors": self.errors,
+            "total_seconds": round(self.total_seconds, 4),
+            "avg_seconds": round(self.total_seconds / self.calls, 4) if self.calls else 0.0,
+            "max_seconds": round(self.max_seconds, 4),
+        }
+
+
+class _RetryingClient:
+    """
+    Retry policy and per-endpoint metrics shared by the sync and async clients.
+    """
+
+    def __init__(
+        self,
+        pat: str | None = None,
+        timeout: float = DEFAULT_TIMEOUT,
+        max_retries: int = MAX_RETRIES,
+        backoff_base: float = BACKOFF_BASE,
+        backoff_max: float = BACKOFF_MAX,
+        metrics_from: "_RetryingClient | None" = None,
+    ):
+        self.pat = pat
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        if metrics_from is not None:
+            # Record into another client's counters, so one report covers both
+            self._stats, self._lock = metrics_from._stats, metrics_from._lock
+        else:
+            self._stats: dict[str, EndpointStats] = defaultdict(EndpointStats)
+            self._lock = threading.Lock()
+
+    def _prepare(self, method: str, url: str, pat: str | None, kwargs: dict) -> tuple[str, str]:
+        method = method.upper()
+        kwargs.setdefault("timeout", self.timeout)
+        pat = pat if pat is not None else self.pat
+        if "auth" not in kwargs and pat is not None:
+            kwargs["auth"] = ("", str(pat))
+        return method, endpoint_name(method, url)
+
+    def _backoff(self, attempt: int, response) -> float:
+        if response is not None:
+            retry_after = _retry_after_seconds(response)
+            if retry_after is not None:
+                return min(retry_after, self.backoff_max)
+        # Full jitter keeps concurrent runners from retrying in lockstep
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    def _retry_delay(self, endpoint: str, attempt: int, response) -> float:
+        delay = self._backoff(attempt, response)
+        status = response.status_code if response is not None else "connection error"
+        print(f"Azure DevOps {endpoint} returned {status}, retrying in {delay:.1f}s "
+              f"(attempt {attempt + 1}/{self.max_retries})")
+        self._record_retry(endpoint)
+        return delay
+
+    def _record(self, endpoint: str, error: bool = False):
+        with self._lock:
+            stats = self._stats[endpoint]
+            stats.calls += 1
+            if error:
+                stats.errors += 1
+
+    def _record_retry(self, endpoint: str):
+        with self._lock:
+            self._stats[endpoint].retries += 1
+
+    def _record_latency(self, endpoint: str, seconds: float):
+        with self._lock:
+            stats = self._stats[endpoint]
+            stats.total_seconds += seconds
+            stats.max_seconds = max(stats.max_seconds, seconds)
+
+    def metrics(self) -> dict[str, dict]:
+        """
+        Returns per-endpoint call, retry, error and latency counters.
+        Latency includes time spent waiting between retries.
+        """
+        with self._lock:
+            return {endpoint: stats.as_dict() for endpoint, stats in sorted(self._stats.items())}
+
+    def print_metrics(self):
+        metrics = self.metrics()
+        if not metrics:
+            return
+        print("Azure DevOps API calls:")
+        for endpoint, m in metrics.items():
+            print(f"  {endpoint}: {m['calls']} calls, {m['retries']} retries, {m['errors']} errors, "
+                  f"avg {m['avg_seconds']:.3f}s, max {m['max_seconds']:.3f}s")
+
+
+class AzureDevOpsClient(_RetryingClient):
+    """
+    Shared HTTP client for the Azure DevOps REST API.
+
+    Keeps one pooled requests.Session so connections are reused between calls,
+    applies a default timeout, and retries throttled (429) and unavailable (503)
+    responses with jittered exponential back-off that honors Retry-After.
+    """
+
+    def __init__(self, pat: str | None = None, pool_maxsize: int = 16, **kwargs):
+        super().__init__(pat, **kwargs)
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_maxsize)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def request(self, method: str, url: str, pat: str | None = None, **kwargs) -> requests.Response:
+        method, endpoint = self._prepare(method, url, pat, kwargs)
+        attempt = 0
+        start = time.perf_counter()
+        try:
+            while True:
+                response = None
+                try:
+                    response = self.session.request(method, url, **kwargs)
+                except (requests.ConnectionError, requests.Timeout):
+                    # Only resend requests that are safe to repeat
+                    if method not in IDEMPOTENT_METHODS or attempt >= self.max_retries:
+                        self._record(endpoint, error=True)
+                        raise
+                else:
+                    if response.status_code not in RETRY_STATUS_CODES or attempt >= self.max_retries:
+                        self._record(endpoint, error=response.status_code >= 400)
+                        return response
+                delay = self._retry_delay(endpoint, attempt, response)
+                if response is not None:
+                    response.close()  # Release the pooled connection before waiting
+                attempt += 1
+                time.sleep(delay)
+        finally:
+            self._record_latency(endpoint, time.perf_counter() - start)
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url: str, **kwargs) -> requests.Response:
+        return self.request("POST", url, **kwargs)
+
+    def put(self, url: str, **kwargs) -> requests.Response:
+        return self.request("PUT", url, **kwargs)
+
+    def patch(self, url: str, **kwargs) -> requests.Response:
+        return self.request("PATCH", url, **kwargs)
+
+    def delete(self, url: str, **kwargs) -> requests.Response:
+        return self.request("DELETE", url, **kwargs)
+
+    def close(self):
+        self.session.close()
+
+
+class AsyncAzureDevOpsClient(_RetryingClient):
+    """
+    asyncio counterpart of AzureDevOpsClient on a pooled httpx.AsyncClient,
+    with the same timeout, retry policy and metrics.
+    """
+
+    def __init__(self, pat: str | None = None, pool_maxsize: int = 16, **kwargs):
+        import httpx  # Only the async tools need it
+
+        super().__init__(pat, **kwargs)
+        self._transport_errors = (httpx.TransportError,)
+        self.session = httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=pool_maxsize, max_keepalive_connections=pool_maxsize),
+        )
+
+    async def request(self, method: str, url: str, pat: str | None = None, **kwargs):
+        method, endpoint = self._prepare(method, url, pat, kwargs)
+        attempt = 0
+        start = time.perf_counter()
+        try:
+            while True:
+                response = None
+                try:
+                    response = await self.session.request(method, url, **kwargs)
+                except self._transport_errors:
+                    # Only resend requests that are safe to repeat
+                    if method not in IDEMPOTENT_METHODS or attempt >= self.max_retries:
+                        self._record(endpoint, error=True)
+                        raise
+                else:
+                    if response.status_code not in RETRY_STATUS_CODES or attempt >= self.max_retries:
+                        self._record(endpoint, error=response.status_code >= 400)
+                        return response
+                delay = self._retry_delay(endpoint, attempt, response)
+                if response is not None:
+                    await response.aclose()
+                attempt += 1
+                await asyncio.sleep(delay)
+        finally:
+            self._record_latency(endpoint, time.perf_counter() - start)
+
+    async def get(self, url: str, **kwargs):
+        return await self.request("GET", url, **kwargs)
+
+    async def post(self, url: str, **kwargs):
+        return await self.request("POST", url, **kwargs)
+
+    async def put(self, url: str, **kwargs):
+        return await self.request("PUT", url, **kwargs)
+
+    async def patch(self, url: str, **kwargs):
+        return await self.request("PATCH", url, **kwargs)
+
+    async def delete(self, url: str, **kwargs):
+        return await self.request("DELETE", url, **kwargs)
+
+    async def close(self):
+        await self.session.aclose()
+
+
+_client: AzureDevOpsClient | None = None
+_client_lock = threading.Lock()
+
+
+def get_client() -> AzureDevOpsClient:
+    """
+    Returns the process-wide client so every caller shares one connection pool.
+    """
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = AzureDevOpsClient()
+        return _client
+
+
+# httpx connections belong to the event loop that opened them, so the async
+# pool is shared per loop and dropped together with it
+_async_clients: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()
+_starting_closers: set[asyncio.Task] = set()
+
+
+async def _close_with_loop(client: AsyncAzureDevOpsClient):
+    # An async generator the loop finalizes in shutdown_asyncgens(), which
+    # asyncio.run() calls before closing the loop
+    try:
+        yield
+    finally:
+        with _client_lock:
+            _async_clients.pop(asyncio.get_running_loop(), None)
+        await client.close()
+
+
+def get_async_client() -> AsyncAzureDevOpsClient:
+    """
+    Returns the client of the running event loop so every coroutine on the
+    loop shares one connection pool. Its calls are counted in get_client()'s
+    metrics, and it's closed when asyncio.run() shuts the loop down.
+    """
+    loop = asyncio.get_running_loop()
+    sync_client = get_client()
+    with _client_lock:
+        entry = _async_clients.get(loop)
+        if entry is None:
+            client = AsyncAzureDevOpsClient(metrics_from=sync_client)
+            closer = _close_with_loop(client)
+            entry = _async_clients[loop] = (client, closer)
+            # Runs the generator to its yield; the task is only referenced until then
+            task = loop.create_task(anext(closer))
+            _starting_closers.add(task)
+            task.add_done_callback(_starting_closers.discard)
+        return entry[0]
+
+
+async def aclose_async_client():
+    """
+    Closes the running loop's client, for loops that aren't run by asyncio.run().
+    """
+    with _client_lock:
+        entry = _async_clients.pop(asyncio.get_running_loop(), None)
+    if entry is not None:
+        await entry[0].close()
@@ -1,9 +1,10 @@
 
 import os
-import requests
 from langchain.tools import StructuredTool
 from pydantic import BaseModel, Field
 
+from agent.azure_devops_client import azure_devops_base_url, get_async_client, get_client
+
 class AzureDevOpsCommentInput(BaseModel):
     work_item_id: str = Field(..., description="The ID of the Azure DevOps work item.")
     comment: str = Field(..., description="The comment text to add to the work item.")
@@ -21,11 +22,39 @@ def add_azure_devops_work_item_comment(
     if not all([org, project, pat]):
         return "Azure DevOps org, project, or PAT not set."
     url = (
-        f"https://dev.azure.com/{org}/{project}/_apis/wit/workItems/"
+        f"{azure_devops_base_url()}/{org}/{project}/_apis/wit/workItems/"
+        f"{work_item_id}/comments?format=markdown&api-version=7.2-preview.4"
+    )
+    data = {"text": comment}
+    response = get_client().post(
+        url,
+        json=data,
+        auth=("", str(pat) if pat is not None else "")
+    )
+    try:
+        response.raise_for_status()
+    except Exception as e:
+        return f"Failed to add comment: {e}"
+    return f"Comment added to work item {work_item_id}."
+
+async def aadd_azure_devops_work_item_comment(
+    work_item_id: str,
+    comment: str,
+    org: str | None = None,
+    project: str | None = None,
+    pat: str | None = None,
+) -> str:
+    org = org or os.environ.get("AZURE_DEVOPS_ORG")
+    project = project or os.environ.get("AZURE_DEVOPS_PROJECT")
+    pat = pat or os.environ.get("AZURE_DEVOPS_PAT")
+    if not all([org, project, pat]):
+        return "Azure DevOps org, project, or PAT not set."
+    url = (
+        f"{azure_devops_base_url()}/{org}/{project}/_apis/wit/workItems/"
         f"{work_item_id}/comments?format=markdown&api-version=7.2-preview.4"
     )
     data = {"text": comment}
-    response = requests.post(
+    response = await get_async_client().post(
         url,
         json=data,
         auth=("", str(pat) if pat is not None else "")
@@ -46,6 +75,9 @@ class AzureDevOpsCommentTool(StructuredTool):
             func=lambda work_item_id, comment: add_azure_devops_work_item_comment(
                 work_item_id, comment, org=org, project=project, pat=pat
             ),
+            coroutine=lambda work_item_id, comment: aadd_azure_devops_work_item_comment(
+                work_item_id, comment, org=org, project=project, pat=pat
+            ),
             name="add_azure_devops_work_item_comment",
             description=(
                 "Add a comment to an Azure DevOps work item. "
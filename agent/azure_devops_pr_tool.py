@@ -1,9 +1,12 @@
+import asyncio
 import os
-import requests
+from concurrent.futures import ThreadPoolExecutor
 from langchain.tools import StructuredTool
 from pydantic import BaseModel, Field
 from typing import Optional
 
+from agent.azure_devops_client import azure_devops_base_url, get_async_client, get_client
+
 class AzureDevOpsPRInput(BaseModel):
     source_branch: str = Field(..., description="The name of the source branch (e.g., 'feature-branch').")
     target_branch: str = Field(..., description="The name of the target branch (e.g., 'main').")
@@ -12,6 +15,75 @@ class AzureDevOpsPRInput(BaseModel):
     work_item_id: int = Field(..., description="The ID of the work item to link to the pull request.")
     auto_complete: Optional[bool] = Field(False, description="Whether to set the pull request to auto-complete.")
 
+def _pull_request_request(
+    source_branch: str,
+    target_branch: str,
+    title: str,
+    description: Optional[str],
+    org: Optional[str],
+    project: Optional[str],
+    repo_id: Optional[str],
+    pat: Optional[str],
+) -> dict | None:
+    """
+    Resolves the settings and builds the PR creation call shared by the sync
+    and async tools. Returns None when a setting is missing.
+    """
+    # Take org, project, pat, repo_id from environment 
+    # variables if not provided, just like the comment tool
+    org = org or os.environ.get("AZURE_DEVOPS_ORG")
+    project = project or os.environ.get("AZURE_DEVOPS_PROJECT")
+    pat = pat or os.environ.get("AZURE_DEVOPS_PAT")
+    repo_id = repo_id or os.environ.get("AZURE_DEVOPS_REPO_ID")
+    if not all([org, project, pat, repo_id]):
+        return None
+    base_url = azure_devops_base_url()
+    return {
+        "repo_url": f"{base_url}/{org}/{project}/_apis/git/repositories/{repo_id}",
+        "web_url": f"{base_url}/{org}/{project}/_git/{repo_id}",
+        "headers": {
+            'Content-Type': 'application/json',
+            'Authorization': f'Bearer {pat}' if pat else '',
+        },
+        "auth": ("", str(pat) if pat is not None else ""),
+        "data": {
+            "sourceRefName": f"refs/heads/{source_branch}",
+            "targetRefName": f"refs/heads/{target_branch}",
+            "title": title,
+            "description": description or "",
+        },
+    }
+
+
+def _follow_up_calls(request: dict, pr_id, work_item_id: int, auto_complete: Optional[bool]) -> dict:
+    """
+    The calls made after the PR exists. They are independent of each other,
+    so both tools send them concurrently.
+    """
+    calls = {}
+    # Attach work item via separate API call after PR creation, as workItemRefs is not a valid field for PR creation
+    if work_item_id and pr_id:
+        calls["work item link"] = (
+            "PUT",
+            f"{request['repo_url']}/pullRequests/{pr_id}/workitems/{work_item_id}?api-version=7.2-preview.2",
+            {},
+        )
+    if auto_complete and pr_id:
+        calls["auto-complete"] = (
+            "PATCH",
+            f"{request['repo_url']}/pullRequests/{pr_id}/autoComplete?api-version=7.2-preview.2",
+            {"json": {"autoCompleteSetBy": {"id": None}}},  # Let the API use the current user
+        )
+    return calls
+
+
+def _pull_request_result(pr_web_url: str, errors: dict[str, Exception | None]) -> str:
+    failures = [f"{name} failed: {error}" for name, error in errors.items() if error is not None]
+    auto_completed = "auto-complete" in errors and errors["auto-complete"] is None
+    message = f"Pull request created{' and set to auto-complete' if auto_completed else ''}: {pr_web_url}"
+    return f"{message} ({'; '.join(failures)})" if failures else message
+
+
 def create_azure_devops_pull_request(
     source_branch: str,
     target_branch: str,
@@ -24,57 +96,70 @@ def create_azure_devops_pull_request(
     repo_id: Optional[str] = None,
     pat: Optional[str] = None,
 ) -> str:
-    # Take org, project, pat, repo_id from environment 
-    # variables if not provided, just like the comment tool
-    org = org or os.environ.get("AZURE_DEVOPS_ORG")
-    project = project or os.environ.get("AZURE_DEVOPS_PROJECT")
-    pat = pat or os.environ.get("AZURE_DEVOPS_PAT")
-    repo_id = repo_id or os.environ.get("AZURE_DEVOPS_REPO_ID")
-    if not all([org, project, pat, repo_id]):
+    request = _pull_request_request(source_branch, target_branch, title, description, org, project, repo_id, pat)
+    if request is None:
         return "Azure DevOps org, project, repo_id, or PAT not set."
-    api_url = f"https://dev.azure.com/{org}/{project}/_apis/git/repositories/{repo_id}/pullrequests?api-version=7.2-preview.2"
-    headers = {
-        'Content-Type': 'application/json',
-        'Authorization': f'Bearer {pat}' if pat else '',
-    }
-    auth = ("", str(pat) if pat is not None else "")
-    data = {
-        "sourceRefName": f"refs/heads/{source_branch}",
-        "targetRefName": f"refs/heads/{target_branch}",
-        "title": title,
-        "description": description or "",
-    }
-    # Attach work item via separate API call after PR creation, as workItemRefs is not a valid field for PR creation
+    client = get_client()
+
+    def send(method, url, kwargs):
+        try:
+            response = client.request(method, url, headers=request["headers"], auth=request["auth"], timeout=30, **kwargs)
+            response.raise_for_status()
+        except Exception as e:
+            return e
+        return None
+
+    try:
+        response = client.post(
+            f"{request['repo_url']}/pullrequests?api-version=7.2-preview.2",
+            json=request["data"], headers=request["headers"], auth=request["auth"], timeout=30,
+        )
+        response.raise_for_status()
+        pr_id = response.json().get("pullRequestId")
+        calls = _follow_up_calls(request, pr_id, work_item_id, auto_complete)
+        with ThreadPoolExecutor(max_workers=max(len(calls), 1)) as pool:
+            futures = {name: pool.submit(send, *call) for name, call in calls.items()}
+        errors = {name: future.result() for name, future in futures.items()}
+        return _pull_request_result(f"{request['web_url']}/pullrequest/{pr_id}", errors)
+    except Exception as e:
+        return f"Failed to create pull request: {e}"
+
+
+async def acreate_azure_devops_pull_request(
+    source_branch: str,
+    target_branch: str,
+    title: str,
+    work_item_id: int,
+    description: Optional[str] = None,
+    auto_complete: Optional[bool] = False,
+    org: Optional[str] = None,
+    project: Optional[str] = None,
+    repo_id: Optional[str] = None,
+    pat: Optional[str] = None,
+) -> str:
+    request = _pull_request_request(source_branch, target_branch, title, description, org, project, repo_id, pat)
+    if request is None:
+        return "Azure DevOps org, project, repo_id, or PAT not set."
+    client = get_async_client()
+
+    async def send(method, url, kwargs):
+        try:
+            response = await client.request(method, url, headers=request["headers"], auth=request["auth"], timeout=30, **kwargs)
+            response.raise_for_status()
+        except Exception as e:
+            return e
+        return None
+
     try:
-        response = requests.post(api_url, json=data, headers=headers, auth=auth, timeout=30)
+        response = await client.post(
+            f"{request['repo_url']}/pullrequests?api-version=7.2-preview.2",
+            json=request["data"], headers=request["headers"], auth=request["auth"], timeout=30,
+        )
         response.raise_for_status()
-        pr = response.json()
-        pr_id = pr.get("pullRequestId")
-        pr_url = pr.get("url", "No URL returned")
-        pr_web_url = f"https://dev.azure.com/{org}/{project}/_git/{repo_id}/pullrequest/{pr_id}"
-        # Attach work item if requested
-        if work_item_id and pr_id:
-            wi_url = f"https://dev.azure.com/{org}/{project}/_apis/git/repositories/{repo_id}/pullRequests/{pr_id}/workitems/{work_item_id}?api-version=7.2-preview.2"
-            try:
-                wi_response = requests.put(wi_url, headers=headers, auth=auth, timeout=30)
-                wi_response.raise_for_status()
-            except Exception as wie:
-                return f"Pull request created: {pr_web_url} (work item link failed: {wie})"
-        # Set auto-complete if requested
-        if auto_complete and pr_id:
-            auto_complete_url = f"https://dev.azure.com/{org}/{project}/_apis/git/repositories/{repo_id}/pullRequests/{pr_id}/autoComplete?api-version=7.2-preview.2"
-            auto_complete_data = {
-                "autoCompleteSetBy": {
-                    "id": None  # Let the API use the current user
-                }
-            }
-            try:
-                ac_response = requests.patch(auto_complete_url, json=auto_complete_data, headers=headers, auth=auth, timeout=30)
-                ac_response.raise_for_status()
-                return f"Pull request created and set to auto-complete: {pr_web_url}"
-            except Exception as ace:
-                return f"Pull request created: {pr_web_url} (auto-complete failed: {ace})"
-        return f"Pull request created: {pr_web_url}"
+        pr_id = response.json().get("pullRequestId")
+        calls = _follow_up_calls(request, pr_id, work_item_id, auto_complete)
+        results = await asyncio.gather(*(send(*call) for call in calls.values()))
+        return _pull_request_result(f"{request['web_url']}/pullrequest/{pr_id}", dict(zip(calls, results)))
     except Exception as e:
         return f"Failed to create pull request: {e}"
 
@@ -87,6 +172,9 @@ class AzureDevOpsPRTool(StructuredTool):
             func=lambda source_branch, target_branch, title, work_item_id, description="", auto_complete=True: create_azure_devops_pull_request(
                 source_branch, target_branch, title, work_item_id, description, auto_complete, org=org, project=project, repo_id=repo_id, pat=pat
             ),
+            coroutine=lambda source_branch, target_branch, title, work_item_id, description="", auto_complete=True: acreate_azure_devops_pull_request(
+                source_branch, target_branch, title, work_item_id, description, auto_complete, org=org, project=project, repo_id=repo_id, pat=pat
+            ),
             name="create_azure_devops_pull_request",
             description=(
                 "Create a pull request in Azure DevOps. "
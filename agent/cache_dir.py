@@ -0,0 +1,15 @@
+import os
+
+
+def get_cache_dir(*parts: str) -> str:
+    """
+    Returns (and creates) a directory for the agent's local caches.
+    Defaults to ~/.cache/ai-developer and can be moved with AI_DEVELOPER_CACHE_DIR.
+    """
+    root = os.environ.get("AI_DEVELOPER_CACHE_DIR") or os.path.join(
+        os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache"),
+        "ai-developer",
+    )
+    path = os.path.join(root, *parts)
+    os.makedirs(path, exist_ok=True)
+    return path
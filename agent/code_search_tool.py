@@ -0,0 +1,253 @@
+import fnmatch
+import mmap
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from langchain.tools import StructuredTool
+from langchain_core.callbacks import BaseCallbackHandler
+from pydantic import BaseModel, Field
+
+from agent.codebase_index_tool import list_codebase_files, path_prefix
+
+# Tools that can add or remove files of the codebase; the file list is
+# listed again on the next search after one of them ran
+FILE_CHANGING_TOOLS = {"write_file", "edit_file", "copy_file", "move_file", "file_delete", "run_shell_command", "run_tests"}
+MMAP_MIN_BYTES = 256 * 1024  # Larger files are memory-mapped instead of read
+MAX_FILE_BYTES = 50 * 1024 * 1024
+MAX_MATCHES_PER_FILE = 1000  # Counting stops here, e.g. for generated files
+MAX_CONTEXT_LINES = 10
+MAX_LINE_CHARS = 300
+MAX_OUTPUT_CHARS = 20000
+SEARCH_WORKERS = min(8, os.cpu_count() or 1)
+_DEFINITION = re.compile(rb"^\s*(?:export\s+)?(?:async\s+)?(?:def|class|function|interface|type|enum|struct|func|fn)\b")
+
+
+class CodeSearchInput(BaseModel):
+    query: str = Field(..., description="Text to search for, or a regular expression if regex is true.")
+    regex: bool = Field(False, description="Treat query as a Python regular expression.")
+    case_sensitive: bool = Field(False, description="Match case exactly.")
+    path: str | None = Field(None, description="Optional directory (relative to the codebase root) to search in.")
+    glob: str | None = Field(None, description="Optional file name pattern, e.g. '*.py' or 'src/**/*.ts'.")
+    context_lines: int = Field(2, description=f"Lines of context to show around each match (at most {MAX_CONTEXT_LINES}).")
+    max_results: int = Field(50, description="Maximum number of matches to show in total.")
+    max_per_file: int = Field(10, description="Maximum number of matches to show per file.")
+
+
+def _search_file(full_path: str, pattern: re.Pattern, context_lines: int, max_per_file: int) -> dict | None:
+    """
+    Returns the match count and the first matches of one file with their
+    context lines, or None if it has no matches or is binary.
+    """
+    try:
+        size = os.path.getsize(full_path)
+        if size == 0 or size > MAX_FILE_BYTES:
+            return None
+        with open(full_path, "rb") as f:
+            data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if size >= MMAP_MIN_BYTES else f.read()
+    except (OSError, ValueError):
+        return None
+    try:
+        if b"\0" in data[:8192]:
+            return None
+        count = 0
+        definitions = 0
+        matches = []
+        line_number = 1
+        counted_to = 0
+        for match in pattern.finditer(data):
+            count += 1
+            line_start = data.rfind(b"\n", 0, match.start()) + 1
+            if _DEFINITION.match(data[line_start:match.start()]):
+                definitions += 1
+            if len(matches) < max_per_file:
+                line_number += data[counted_to:line_start].count(b"\n")
+                counted_to = line_start
+                matches.append((line_number, line_start))
+            if count >= MAX_MATCHES_PER_FILE:
+                break
+        if not count:
+            return None
+        lines = {}
+        for line_number, line_start in matches:
+            # Walk back and forward from the matching line for the context
+            start = line_start
+            for _ in range(context_lines):
+                if start == 0:
+                    break
+                start = data.rfind(b"\n", 0, start - 1) + 1
+            end = line_start
+            for _ in range(context_lines + 1):
+                next_end = data.find(b"\n", end)
+                end = len(data) if next_end == -1 else next_end + 1
+                if end >= len(data):
+                    break
+            first = line_number - data[start:line_start].count(b"\n")
+            for offset, raw_line in enumerate(data[start:end].splitlines()):
+                number = first + offset
+                if number not in lines:
+                    lines[number] = (raw_line.decode("utf-8", errors="replace"), False)
+            lines[line_number] = (lines[line_number][0], True)
+        return {"count": count, "definitions": definitions, "shown": len(matches), "lines": lines}
+    finally:
+        if isinstance(data, mmap.mmap):
+            data.close()
+
+
+class CodeSearcher:
+    """
+    Searches the files of a codebase (honoring .gitignore) in parallel and
+    ranks the files with matches. The file list is reused between searches
+    until invalidate() is called, see FileListInvalidator.
+    """
+
+    def __init__(self, codebase_path: str):
+        self.codebase_path = os.path.abspath(codebase_path)
+        self._files: list[str] | None = None
+        self._lock = threading.Lock()
+
+    def files(self) -> list[str]:
+        with self._lock:
+            if self._files is None:
+                self._files = list_codebase_files(self.codebase_path)
+            return self._files
+
+    def invalidate(self):
+        with self._lock:
+            self._files = None
+
+    def search(
+        self,
+        query: str,
+        regex: bool = False,
+        case_sensitive: bool = False,
+        path: str | None = None,
+        glob: str | None = None,
+        context_lines: int = 2,
+        max_per_file: int = 10,
+    ) -> tuple[list[tuple[str, dict]], int]:
+        """
+        Returns the (path, result) pairs of matching files, best first, and
+        the number of files searched.
+        """
+        flags = re.MULTILINE if case_sensitive else re.MULTILINE | re.IGNORECASE
+        pattern = re.compile(query.encode() if regex else re.escape(query.encode()), flags)
+        prefix = path_prefix(path)
+        candidates = [
+            p for p in self.files()
+            if p.startswith(prefix) and (not glob or fnmatch.fnmatch(p, glob) or fnmatch.fnmatch(os.path.basename(p), glob))
+        ]
+        context_lines = max(0, min(context_lines, MAX_CONTEXT_LINES))
+
+        def search_file(rel_path):
+            return _search_file(os.path.join(self.codebase_path, rel_path), pattern, context_lines, max(1, max_per_file))
+
+        with ThreadPoolExecutor(max_workers=SEARCH_WORKERS) as pool:
+            results = [(p, r) for p, r in zip(candidates, pool.map(search_file, candidates)) if r]
+        needle = query.lower()
+
+        def rank(item):
+            rel_path, result = item
+            name_match = not regex and needle in os.path.basename(rel_path).lower()
+            return (-(result["definitions"] * 10 + name_match * 3 + min(result["count"], 20)), rel_path.count("/"), rel_path)
+
+        results.sort(key=rank)
+        return results, len(candidates)
+
+
+def search_code(
+    searcher: CodeSearcher,
+    query: str,
+    regex: bool = False,
+    case_sensitive: bool = False,
+    path: str | None = None,
+    glob: str | None = None,
+    context_lines: int = 2,
+    max_results: int = 50,
+    max_per_file: int = 10,
+) -> str:
+    if not query:
+        return "Error: query must not be empty."
+    start = time.perf_counter()
+    try:
+        results, searched = searcher.search(query, regex, case_sensitive, path, glob, context_lines, max_per_file)
+    except re.error as e:
+        return f"Error: invalid regular expression: {e}"
+    total = sum(r["count"] for _, r in results)
+    lines = [
+        f"{total}{'+' if any(r['count'] >= MAX_MATCHES_PER_FILE for _, r in results) else ''} matches in "
+        f"{len(results)} files ({searched} files searched in {time.perf_counter() - start:.2f}s)."
+    ]
+    shown = 0
+    for file_index, (rel_path, result) in enumerate(results):
+        if shown >= max_results:
+            lines.append(f"... {len(results) - file_index} more files with matches, narrow the query, path or glob to see them.")
+            break
+        lines.append("")
+        lines.append(f"{rel_path} ({result['count']} matches)")
+        previous = None
+        matches_left = max_results - shown
+        for number in sorted(result["lines"]):
+            text, is_match = result["lines"][number]
+            if is_match:
+                if matches_left == 0:
+                    break
+                matches_left -= 1
+                shown += 1
+            if previous is not None and number > previous + 1:
+                lines.append("  --")
+            if len(text) > MAX_LINE_CHARS:
+                text = text[:MAX_LINE_CHARS] + " ..."
+            lines.append(f"  {number}{':' if is_match else '-'} {text}")
+            previous = number
+        if result["count"] > result["shown"]:
+            lines.append(f"  ... {result['count'] - result['shown']} more matches in this file")
+    output = "\n".join(lines)
+    if len(output) > MAX_OUTPUT_CHARS:
+        return output[:MAX_OUTPUT_CHARS] + "\n... output truncated, narrow the query, path or glob, or lower context_lines."
+    return output
+
+
+class FileListInvalidator(BaseCallbackHandler):
+    """
+    Callback handler that makes a CodeSearcher list the files again once a
+    tool that can add or remove files (FILE_CHANGING_TOOLS) has finished.
+    """
+
+    def __init__(self, searcher: CodeSearcher):
+        self.searcher = searcher
+        self._running: set = set()
+
+    def on_tool_start(self, serialized, input_str, *, run_id, **kwargs):
+        if (serialized or {}).get("name") in FILE_CHANGING_TOOLS:
+            self._running.add(run_id)
+
+    def on_tool_end(self, output, *, run_id, **kwargs):
+        if run_id in self._running:
+            self._running.discard(run_id)
+            self.searcher.invalidate()
+
+    def on_tool_error(self, error, *, run_id, **kwargs):
+        self.on_tool_end(None, run_id=run_id)
+
+
+class CodeSearchTool(StructuredTool):
+    """
+    StructuredTool for searching the contents of the codebase.
+    """
+
+    def __init__(self, codebase_path: str, searcher: CodeSearcher | None = None):
+        searcher = searcher or CodeSearcher(codebase_path)
+        super().__init__(
+            func=lambda query, regex=False, case_sensitive=False, path=None, glob=None, context_lines=2, max_results=50, max_per_file=10: search_code(
+                searcher, query, regex, case_sensitive, path, glob, context_lines, max_results, max_per_file
+            ),
+            name="search_code",
+            description=(
+                "Search the contents of the codebase for text or a regular expression, skipping files ignored by .gitignore. "
+                "Returns matches with line numbers and context, grouped per file, files with definitions and more matches first. "
+                "Use it instead of grep through the shell; 'path' and 'glob' narrow the search."
+            ),
+            args_schema=CodeSearchInput,
+        )
@@ -0,0 +1,424 @@
+import ast
+import hashlib
+import json
+import os
+import re
+import subprocess
+import threading
+import time
+from langchain.tools import StructuredTool
+from pydantic import BaseModel, Field
+
+from agent.cache_dir import get_cache_dir
+
+INDEX_VERSION = 2
+MAX_INDEXES = 20  # Indexes of other repositories kept, least recently written ones are deleted
+MAX_PARSE_BYTES = 1024 * 1024  # Files larger than this are listed and hashed but not parsed for symbols
+MAX_OUTPUT_CHARS = 20000
+# Used when the codebase isn't a git repository and .gitignore can't be applied through git
+SKIP_DIRS = {".git", "node_modules", "__pycache__", ".venv", "venv", "dist", "build", "bin", "obj", "target", ".next", ".idea", ".vs"}
+
+LANGUAGES = {
+    ".py": "python",
+    ".js": "javascript", ".jsx": "javascript", ".mjs": "javascript", ".cjs": "javascript",
+    ".ts": "typescript", ".tsx": "typescript",
+    ".cs": "csharp",
+    ".java": "java", ".kt": "kotlin",
+    ".go": "go",
+    ".rs": "rust",
+    ".rb": "ruby",
+    ".php": "php",
+    ".c": "c", ".h": "c", ".cpp": "cpp", ".hpp": "cpp", ".cc": "cpp",
+    ".swift": "swift",
+    ".sh": "shell",
+    ".md": "markdown",
+    ".json": "json", ".yml": "yaml", ".yaml": "yaml", ".toml": "toml",
+    ".html": "html", ".css": "css", ".scss": "css",
+    ".sql": "sql",
+}
+
+# (kind, pattern) pairs, the first group of each pattern is the symbol name
+_JS_PATTERNS = [
+    ("class", r"^\s*(?:export\s+)?(?:default\s+)?(?:abstract\s+)?class\s+([A-Za-z_$][\w$]*)"),
+    ("function", r"^\s*(?:export\s+)?(?:default\s+)?(?:async\s+)?function\*?\s+([A-Za-z_$][\w$]*)"),
+    ("function", r"^\s*(?:export\s+)?(?:const|let|var)\s+([A-Za-z_$][\w$]*)\s*=\s*(?:async\s+)?(?:\([^)]*\)|[A-Za-z_$][\w$]*)\s*=>"),
+    ("interface", r"^\s*(?:export\s+)?interface\s+([A-Za-z_$][\w$]*)"),
+    ("type", r"^\s*(?:export\s+)?type\s+([A-Za-z_$][\w$]*)\s*="),
+    ("enum", r"^\s*(?:export\s+)?(?:const\s+)?enum\s+([A-Za-z_$][\w$]*)"),
+]
+SYMBOL_PATTERNS = {
+    "javascript": _JS_PATTERNS,
+    "typescript": _JS_PATTERNS,
+    "csharp": [
+        ("class", r"^\s*(?:[\w\[\]]+\s+)*(?:class|record|struct)\s+(\w+)"),
+        ("interface", r"^\s*(?:[\w\[\]]+\s+)*interface\s+(\w+)"),
+        ("enum", r"^\s*(?:[\w\[\]]+\s+)*enum\s+(\w+)"),
+        ("method", r"^\s*(?:public|private|protected|internal)\s+(?:static\s+|async\s+|override\s+|virtual\s+)*[\w<>\[\],\s]+?\s+(\w+)\s*\("),
+    ],
+    "java": [
+        ("class", r"^\s*(?:\w+\s+)*(?:class|record)\s+(\w+)"),
+        ("interface", r"^\s*(?:\w+\s+)*interface\s+(\w+)"),
+        ("enum", r"^\s*(?:\w+\s+)*enum\s+(\w+)"),
+        ("method", r"^\s*(?:public|private|protected)\s+(?:static\s+|final\s+|abstract\s+|synchronized\s+)*[\w<>\[\],\s]+?\s+(\w+)\s*\("),
+    ],
+    "kotlin": [
+        ("class", r"^\s*(?:\w+\s+)*(?:class|object|interface)\s+(\w+)"),
+        ("function", r"^\s*(?:\w+\s+)*fun\s+(?:<[^>]+>\s*)?(?:[\w.]+\.)?(\w+)\s*\("),
+    ],
+    "go": [
+        ("function", r"^func\s+(?:\([^)]*\)\s*)?(\w+)\s*[\[(]"),
+        ("type", r"^type\s+(\w+)\s"),
+    ],
+    "rust": [
+        ("function", r"^\s*(?:pub(?:\([^)]*\))?\s+)?(?:async\s+)?(?:unsafe\s+)?fn\s+(\w+)"),
+        ("struct", r"^\s*(?:pub(?:\([^)]*\))?\s+)?struct\s+(\w+)"),
+        ("enum", r"^\s*(?:pub(?:\([^)]*\))?\s+)?enum\s+(\w+)"),
+        ("trait", r"^\s*(?:pub(?:\([^)]*\))?\s+)?trait\s+(\w+)"),
+        ("impl", r"^\s*impl(?:<[^>]*>)?\s+(?:[\w:<>]+\s+for\s+)?(\w+)"),
+    ],
+    "ruby": [
+        ("class", r"^\s*class\s+([\w:]+)"),
+        ("module", r"^\s*module\s+([\w:]+)"),
+        ("method", r"^\s*def\s+(?:self\.)?([\w?!=]+)"),
+    ],
+    "php": [
+        ("class", r"^\s*(?:abstract\s+|final\s+)?(?:class|interface|trait)\s+(\w+)"),
+        ("function", r"^\s*(?:public\s+|private\s+|protected\s+|static\s+)*function\s+(\w+)"),
+    ],
+    "swift": [
+        ("class", r"^\s*(?:\w+\s+)*(?:class|struct|enum|protocol|extension)\s+(\w+)"),
+        ("function", r"^\s*(?:\w+\s+)*func\s+(\w+)"),
+    ],
+    "c": [("function", r"^[A-Za-z_][\w\s\*]*?\b(\w+)\s*\([^;]*$")],
+    "cpp": [
+        ("class", r"^\s*(?:class|struct)\s+(\w+)"),
+        ("function", r"^[A-Za-z_][\w\s\*&:<>]*?\b([\w:~]+)\s*\([^;]*$"),
+    ],
+    "shell": [("function", r"^\s*(?:function\s+)?([\w-]+)\s*\(\)\s*\{?")],
+    "markdown": [("heading", r"^#{1,3}\s+(.+?)\s*#*$")],
+    "sql": [("table", r"(?i)^\s*create\s+(?:table|view|procedure|function)\s+(?:if\s+not\s+exists\s+)?([\w.\[\]\"`]+)")],
+}
+_COMPILED_PATTERNS = {
+    language: [(kind, re.compile(pattern)) for kind, pattern in patterns]
+    for language, patterns in SYMBOL_PATTERNS.items()
+}
+_COMMENT_PREFIXES = ("#", "//", "/*", "*", "--", "<!--")
+
+
+class CodebaseIndexInput(BaseModel):
+    query: str | None = Field(None, description="Optional case-insensitive text to match against file paths, symbol names and summaries.")
+    path: str | None = Field(None, description="Optional directory (relative to the codebase root) to limit the results to.")
+    include_symbols: bool = Field(True, description="Whether to list the classes, functions and other symbols defined in each file.")
+    include_summaries: bool = Field(False, description="Whether to include a one-line summary of each file, taken from its docstring or leading comment.")
+    max_files: int = Field(200, description="Maximum number of files to list.")
+
+
+def file_sha1(path: str) -> str:
+    digest = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _python_symbols(text: str) -> list[dict]:
+    try:
+        tree = ast.parse(text)
+    except (SyntaxError, ValueError):
+        return _regex_symbols(text, [("class", re.compile(r"^\s*class\s+(\w+)")), ("function", re.compile(r"^\s*(?:async\s+)?def\s+(\w+)"))])
+    symbols = []
+    for node in tree.body:
+        if isinstance(node, ast.ClassDef):
+            symbols.append({"kind": "class", "name": node.name, "line": node.lineno})
+            for child in node.body:
+                if isinstance(child, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                    symbols.append({"kind": "method", "name": f"{node.name}.{child.name}", "line": child.lineno})
+        elif isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            symbols.append({"kind": "function", "name": node.name, "line": node.lineno})
+        elif isinstance(node, ast.Assign):
+            for target in node.targets:
+                if isinstance(target, ast.Name) and target.id.isupper():
+                    symbols.append({"kind": "constant", "name": target.id, "line": node.lineno})
+    return symbols
+
+
+def _regex_symbols(text: str, patterns) -> list[dict]:
+    symbols = []
+    for line_number, line in enumerate(text.splitlines(), start=1):
+        for kind, pattern in patterns:
+            match = pattern.match(line)
+            if match:
+                symbols.append({"kind": kind, "name": match.group(1), "line": line_number})
+                break
+    return symbols
+
+
+def _summary(text: str, language: str) -> str | None:
+    if language == "python":
+        try:
+            docstring = ast.get_docstring(ast.parse(text))
+        except (SyntaxError, ValueError):
+            docstring = None
+        if docstring:
+            return docstring.strip().splitlines()[0][:200]
+    for line in text.splitlines()[:30]:
+        stripped = line.strip()
+        if not stripped or stripped.startswith(("#!", "'use strict'", '"use strict"')):
+            continue
+        if language == "markdown":
+            return stripped.lstrip("#").strip()[:200]
+        if stripped.startswith(_COMMENT_PREFIXES):
+            comment = stripped.lstrip("#/*-<!> ").rstrip("*/-> ").strip()
+            if comment:
+                return comment[:200]
+            continue
+        break
+    return None
+
+
+def parse_file(path: str, language: str | None) -> tuple[list[dict], str | None]:
+    """
+    Extracts the symbols defined in a file and a one-line summary of it.
+    """
+    if language is None or os.path.getsize(path) > MAX_PARSE_BYTES:
+        return [], None
+    with open(path, "rb") as f:
+        data = f.read()
+    if b"\0" in data[:8192]:
+        return [], None  # Binary file
+    text = data.decode("utf-8", errors="replace")
+    if language == "python":
+        symbols = _python_symbols(text)
+    else:
+        symbols = _regex_symbols(text, _COMPILED_PATTERNS.get(language, []))
+    return symbols, _summary(text, language)
+
+
+def list_codebase_files(codebase_path: str) -> list[str]:
+    """
+    Lists the files of the codebase relative to its root, sorted.
+    """
+    # git honors .gitignore and includes untracked files, fall back to a directory walk otherwise
+    try:
+        result = subprocess.run(
+            ["git", "-C", codebase_path, "ls-files", "-z", "--cached", "--others", "--exclude-standard"],
+            capture_output=True,
+            timeout=60
+        )
+        if result.returncode == 0:
+            paths = [p.decode("utf-8", errors="replace") for p in result.stdout.split(b"\0") if p]
+            return sorted(p for p in set(paths) if os.path.isfile(os.path.join(codebase_path, p)))
+    except (OSError, subprocess.SubprocessError):
+        pass
+    paths = []
+    for root, dirs, files in os.walk(codebase_path):
+        dirs[:] = [d for d in dirs if d not in SKIP_DIRS]
+        for name in files:
+            paths.append(os.path.relpath(os.path.join(root, name), codebase_path).replace(os.sep, "/"))
+    return sorted(paths)
+
+
+def path_prefix(path: str | None) -> str:
+    """
+    Turns a directory relative to the codebase root into a prefix of the
+    listed paths, e.g. "./src\\app/" into "src/app/" and "." into "".
+    """
+    prefix = (path or "").replace("\\", "/").strip("/")
+    if prefix.startswith("./"):
+        prefix = prefix[2:]
+    return "" if prefix in ("", ".") else prefix + "/"
+
+
+def repository_identity(codebase_path: str) -> str:
+    """
+    The common git directory of codebase_path, shared by all its worktrees,
+    or the path itself when it isn't in a git repository.
+    """
+    try:
+        result = subprocess.run(
+            ["git", "-C", codebase_path, "rev-parse", "--path-format=absolute", "--git-common-dir"],
+            capture_output=True,
+            text=True,
+            timeout=30
+        )
+        if result.returncode == 0 and result.stdout.strip():
+            return os.path.normpath(result.stdout.strip())
+    except (OSError, subprocess.SubprocessError):
+        pass
+    return os.path.abspath(codebase_path)
+
+
+def evict_indexes(index_dir: str, keep: str | None = None, max_indexes: int = MAX_INDEXES):
+    """
+    Deletes the least recently written indexes beyond max_indexes.
+    """
+    try:
+        entries = [e for e in os.scandir(index_dir) if e.name.endswith(".json") and e.path != keep]
+        entries.sort(key=lambda e: e.stat().st_mtime, reverse=True)
+    except OSError:
+        return
+    for entry in entries[max(0, max_indexes - 1):]:
+        try:
+            os.remove(entry.path)
+        except OSError:
+            pass
+
+
+class CodebaseIndex:
+    """
+    Persistent index of a codebase: file tree with sizes and content hashes,
+    symbols and a one-line summary per file. refresh() only re-reads files
+    whose size or mtime changed, and only re-parses them if their hash changed.
+    """
+
+    def __init__(self, codebase_path: str, index_path: str | None = None):
+        self.codebase_path = os.path.abspath(codebase_path)
+        # Worktrees of one repository share an index: entries whose path and
+        # hash match are reused, so a fresh checkout only re-hashes its files
+        self.repository = repository_identity(self.codebase_path)
+        if index_path is None:
+            key = hashlib.sha1(self.repository.encode()).hexdigest()[:16]
+            index_path = os.path.join(get_cache_dir("index"), f"{key}.json")
+        self.index_path = index_path
+        self.files: dict[str, dict] = {}
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self):
+        try:
+            with open(self.index_path, encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        if data.get("version") == INDEX_VERSION and data.get("repository") == self.repository:
+            self.files = data.get("files", {})
+
+    def _save(self):
+        tmp_path = f"{self.index_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"version": INDEX_VERSION, "repository": self.repository, "files": self.files}, f)
+        os.replace(tmp_path, self.index_path)
+        evict_indexes(os.path.dirname(self.index_path), keep=self.index_path)
+
+    def list_files(self) -> list[str]:
+        return list_codebase_files(self.codebase_path)
+
+    def refresh(self) -> dict:
+        """
+        Brings the index up to date and returns counts of added, updated, unchanged and removed files.
+        """
+        with self._lock:
+            stats = {"added": 0, "updated": 0, "unchanged": 0, "removed": 0}
+            current = {}
+            touched = False
+            for rel_path in self.list_files():
+                full_path = os.path.join(self.codebase_path, rel_path)
+                try:
+                    stat = os.stat(full_path)
+                except OSError:
+                    continue
+                entry = self.files.get(rel_path)
+                if entry and entry["size"] == stat.st_size and entry["mtime"] == stat.st_mtime:
+                    current[rel_path] = entry
+                    stats["unchanged"] += 1
+                    continue
+                sha1 = file_sha1(full_path)
+                if entry and entry["sha1"] == sha1:
+                    # Touched but not modified, keep the parsed symbols
+                    entry.update(size=stat.st_size, mtime=stat.st_mtime)
+                    current[rel_path] = entry
+                    stats["unchanged"] += 1
+                    touched = True
+                    continue
+                language = LANGUAGES.get(os.path.splitext(rel_path)[1].lower())
+                symbols, summary = parse_file(full_path, language)
+                current[rel_path] = {
+                    "size": stat.st_size,
+                    "mtime": stat.st_mtime,
+                    "sha1": sha1,
+                    "language": language,
+                    "symbols": symbols,
+                    "summary": summary,
+                }
+                stats["updated" if entry else "added"] += 1
+            stats["removed"] = len(set(self.files) - set(current))
+            self.files = current
+            if stats["added"] or stats["updated"] or stats["removed"] or touched:
+                self._save()
+            return stats
+
+    def search(self, query: str | None = None, path: str | None = None) -> list[tuple[str, dict, list[dict]]]:
+        """
+        Returns (path, entry, matching symbols) for files under path that match query.
+        A file whose path or summary matches keeps all its symbols.
+        """
+        prefix = path_prefix(path)
+        needle = query.lower() if query else None
+        results = []
+        for rel_path, entry in sorted(self.files.items()):
+            if prefix and not rel_path.startswith(prefix):
+                continue
+            symbols = entry.get("symbols", [])
+            if needle and needle not in rel_path.lower() and needle not in (entry.get("summary") or "").lower():
+                symbols = [s for s in symbols if needle in s["name"].lower()]
+                if not symbols:
+                    continue
+            results.append((rel_path, entry, symbols))
+        return results
+
+
+def _format_size(size: int) -> str:
+    return f"{size} B" if size < 1024 else f"{size / 1024:.1f} KB"
+
+
+def query_codebase_index(
+    index: CodebaseIndex,
+    query: str | None = None,
+    path: str | None = None,
+    include_symbols: bool = True,
+    include_summaries: bool = False,
+    max_files: int = 200,
+) -> str:
+    start = time.perf_counter()
+    stats = index.refresh()
+    results = index.search(query, path)
+    lines = [
+        f"Index of {index.codebase_path}: {len(index.files)} files "
+        f"({stats['added']} added, {stats['updated']} updated, {stats['removed']} removed since last call) "
+        f"in {time.perf_counter() - start:.2f}s. {len(results)} files match."
+    ]
+    for rel_path, entry, symbols in results[:max_files]:
+        line = f"{rel_path} ({_format_size(entry['size'])}"
+        line += f", {entry['language']})" if entry.get("language") else ")"
+        if include_summaries and entry.get("summary"):
+            line += f" - {entry['summary']}"
+        lines.append(line)
+        if include_symbols:
+            lines.extend(f"  {s['kind']} {s['name']} (line {s['line']})" for s in symbols)
+    if len(results) > max_files:
+        lines.append(f"... {len(results) - max_files} more files, narrow the query or path to see them.")
+    output = "\n".join(lines)
+    if len(output) > MAX_OUTPUT_CHARS:
+        return output[:MAX_OUTPUT_CHARS] + "\n... output truncated, narrow the query or path, or set include_symbols to false."
+    return output
+
+
+class CodebaseIndexTool(StructuredTool):
+    """
+    StructuredTool for looking up files and symbols in the codebase index.
+    """
+
+    def __init__(self, codebase_path: str):
+        index = CodebaseIndex(codebase_path)
+        super().__init__(
+            func=lambda query=None, path=None, include_symbols=True, include_summaries=False, max_files=200: query_codebase_index(
+                index, query, path, include_symbols, include_summaries, max_files
+            ),
+            name="codebase_index",
+            description=(
+                "List the files of the codebase with their sizes, languages and the classes, functions and other symbols they define, "
+                "in a single call. Use it instead of browsing directories one by one. Optional 'query' filters by path, symbol name "
+                "or summary; optional 'path' limits the results to a directory; 'include_summaries' adds a one-line summary per file."
+            ),
+            args_schema=CodebaseIndexInput,
+        )
@@ -0,0 +1,191 @@
+import os
+import threading
+
+from langchain.agents.format_scratchpad.tools import format_to_tool_messages
+from langchain.agents.output_parsers.tools import ToolAgentAction
+from langchain_core.messages import AIMessage, BaseMessage
+
+DEFAULT_TOKEN_BUDGET = int(os.environ.get("AI_DEVELOPER_CONTEXT_TOKEN_BUDGET", 30000))
+KEEP_RECENT_STEPS = 4  # The latest tool calls and results are always sent verbatim
+OLD_OBSERVATION_CHARS = 2000  # Older tool results and arguments are trimmed to this size
+MIN_OBSERVATION_CHARS = 200  # ...and down to this size, oldest first, while over budget
+# Tools whose results are replaced by a later call on the same file_path
+FILE_READ_TOOLS = {"read_file"}
+FILE_WRITE_TOOLS = {"write_file", "edit_file"}
+# Partial reads are replaced the same way, but don't replace earlier reads
+FILE_RANGE_READ_TOOLS = {"read_file_range"}
+
+_encoding = None
+_encoding_lock = threading.Lock()
+
+
+def count_tokens(text: str) -> int:
+    """
+    Counts tokens with tiktoken's o200k_base encoding (used by gpt-4.1 and gpt-4o),
+    or estimates four characters per token if the encoding can't be loaded.
+    """
+    global _encoding
+    with _encoding_lock:
+        if _encoding is None:
+            try:
+                import tiktoken
+                _encoding = tiktoken.get_encoding("o200k_base")
+            except Exception:
+                _encoding = False
+    if _encoding:
+        return len(_encoding.encode(text, disallowed_special=()))
+    return len(text) // 4 + 1
+
+
+def count_message_tokens(messages: list[BaseMessage]) -> int:
+    total = 0
+    for message in messages:
+        content = message.content if isinstance(message.content, str) else str(message.content)
+        total += count_tokens(content) + 4  # Per-message overhead of the chat format
+        for tool_call in getattr(message, "tool_calls", None) or []:
+            total += count_tokens(tool_call["name"]) + count_tokens(str(tool_call["args"]))
+    return total
+
+
+def truncate_middle(text: str, limit: int) -> str:
+    if len(text) <= limit:
+        return text
+    half = limit // 2
+    return f"{text[:half]}\n... [{len(text) - 2 * half} characters removed by context compaction] ...\n{text[-half:]}"
+
+
+def _file_path(action) -> str | None:
+    tool_input = action.tool_input if isinstance(action.tool_input, dict) else {}
+    path = tool_input.get("file_path")
+    return os.path.normpath(path) if isinstance(path, str) else None
+
+
+class ScratchpadCompactor:
+    """
+    Message formatter for create_tool_calling_agent that keeps the agent
+    scratchpad within a token budget.
+
+    The most recent steps are sent verbatim. Older reads of a file that was
+    read or written again later are dropped, and older tool results and long
+    tool call arguments (e.g. written file contents) are trimmed. If the
+    scratchpad is still over budget, the oldest results are trimmed further.
+    """
+
+    def __init__(
+        self,
+        token_budget: int = DEFAULT_TOKEN_BUDGET,
+        keep_recent: int = KEEP_RECENT_STEPS,
+        old_observation_chars: int = OLD_OBSERVATION_CHARS,
+        min_observation_chars: int = MIN_OBSERVATION_CHARS,
+        verbose: bool = True,
+    ):
+        self.token_budget = token_budget
+        self.keep_recent = keep_recent
+        self.old_observation_chars = old_observation_chars
+        self.min_observation_chars = min_observation_chars
+        self.verbose = verbose
+        self.step_stats: list[dict] = []
+
+    def __call__(self, intermediate_steps) -> list[BaseMessage]:
+        steps = list(intermediate_steps)
+        raw_messages = format_to_tool_messages(steps)
+        raw_tokens = count_message_tokens(raw_messages)
+        if raw_tokens <= self.token_budget:
+            self._record(len(steps), raw_tokens, raw_tokens)
+            return raw_messages
+
+        recent_start = max(0, len(steps) - self.keep_recent)
+        observations = [str(observation) for _, observation in steps]
+        self._drop_superseded_reads(steps, observations, recent_start)
+        # Maximum length of tool call arguments per step, None keeps them verbatim
+        arg_limits = [self.old_observation_chars if i < recent_start else None for i in range(len(steps))]
+        for i in range(recent_start):
+            observations[i] = truncate_middle(observations[i], self.old_observation_chars)
+        messages = self._format(steps, observations, arg_limits)
+        compacted_tokens = count_message_tokens(messages)
+
+        # Still over budget: trim older steps further, oldest first
+        for i in range(recent_start):
+            if compacted_tokens <= self.token_budget:
+                break
+            observations[i] = truncate_middle(observations[i], self.min_observation_chars)
+            arg_limits[i] = self.min_observation_chars
+            messages = self._format(steps, observations, arg_limits)
+            compacted_tokens = count_message_tokens(messages)
+        self._record(len(steps), raw_tokens, compacted_tokens)
+        return messages
+
+    def _drop_superseded_reads(self, steps, observations, recent_start):
+        last_access = {}
+        for i, (action, _) in enumerate(steps):
+            if action.tool in FILE_READ_TOOLS | FILE_WRITE_TOOLS:
+                path = _file_path(action)
+                if path:
+                    last_access[path] = i
+        for i in range(recent_start):
+            action = steps[i][0]
+            if action.tool in FILE_READ_TOOLS | FILE_RANGE_READ_TOOLS:
+                path = _file_path(action)
+                later = last_access.get(path)
+                if later is not None and later > i:
+                    observations[i] = (
+                        f"[Content of {path} removed by context compaction, "
+                        f"the file was accessed again by {steps[later][0].tool} at step {later + 1}]"
+                    )
+
+    def _format(self, steps, observations, arg_limits) -> list[BaseMessage]:
+        """
+        Builds the scratchpad from the (trimmed) observations, trimming the
+        string arguments of each step's tool calls to its limit.
+        """
+        # One model response can hold several tool calls (one step each), it
+        # gets the smallest limit of its steps so that it is only sent once
+        message_limits = {}
+        for (action, _), limit in zip(steps, arg_limits):
+            if limit is not None and isinstance(action, ToolAgentAction):
+                for message in action.message_log:
+                    message_limits[id(message)] = min(limit, message_limits.get(id(message), limit))
+        compacted_messages = {}
+
+        def compact_message(message):
+            limit = message_limits.get(id(message))
+            if limit is None or not isinstance(message, AIMessage) or not message.tool_calls:
+                return message
+            if id(message) not in compacted_messages:
+                tool_calls = [
+                    {**tool_call, "args": {
+                        key: truncate_middle(value, limit) if isinstance(value, str) else value
+                        for key, value in tool_call["args"].items()
+                    }}
+                    for tool_call in message.tool_calls
+                ]
+                compacted_messages[id(message)] = message.model_copy(update={"tool_calls": tool_calls})
+            return compacted_messages[id(message)]
+
+        compacted_steps = []
+        for (action, _), observation in zip(steps, observations):
+            if isinstance(action, ToolAgentAction):
+                action = ToolAgentAction(
+                    tool=action.tool,
+                    tool_input=action.tool_input,
+                    log=action.log,
+                    message_log=[compact_message(m) for m in action.message_log],
+                    tool_call_id=action.tool_call_id,
+                )
+            compacted_steps.append((action, observation))
+        return format_to_tool_messages(compacted_steps)
+
+    def _record(self, steps: int, raw_tokens: int, compacted_tokens: int):
+        self.step_stats.append({"step": steps + 1, "raw_tokens": raw_tokens, "compacted_tokens": compacted_tokens})
+        if self.verbose:
+            saved = raw_tokens - compacted_tokens
+            print(f"Scratchpad for LLM call {steps + 1}: {compacted_tokens} tokens"
+                  + (f" (compacted from {raw_tokens}, saved {saved})" if saved else ""))
+
+    def print_stats(self):
+        if not self.step_stats:
+            return
+        raw = sum(s["raw_tokens"] for s in self.step_stats)
+        compacted = sum(s["compacted_tokens"] for s in self.step_stats)
+        print(f"Scratchpad tokens sent over {len(self.step_stats)} LLM calls: {compacted} "
+              f"(without compaction: {raw}, saved {raw - compacted})")
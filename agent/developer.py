@@ -1,6 +1,9 @@
+import importlib
+import os
+from functools import cached_property
 from typing import Optional
 
-from langchain.agents import AgentExecutor, create_tool_calling_agent
+from langchain.agents import create_tool_calling_agent
 from langchain.prompts import ChatPromptTemplate, MessagesPlaceholder
 from langchain_community.agent_toolkits import FileManagementToolkit
 from langchain_core.runnables import RunnableConfig
@@ -8,7 +11,24 @@ from langchain_openai import AzureChatOpenAI
 
 from agent.azure_devops_comment_tool import AzureDevOpsCommentTool
 from agent.azure_devops_pr_tool import AzureDevOpsPRTool
+from agent.code_search_tool import CodeSearcher, CodeSearchTool, FileListInvalidator
+from agent.codebase_index_tool import CodebaseIndexTool
+from agent.context_compaction import DEFAULT_TOKEN_BUDGET, ScratchpadCompactor
+from agent.file_edit_tools import EditFileTool, ReadFileRangeTool
+from agent.parallel_executor import MAX_PARALLEL_TOOLS, ParallelToolAgentExecutor
+from agent.response_cache import (
+    CACHEABLE_TOOLS,
+    DEFAULT_CACHE_MODE,
+    RECORDED_TOOLS,
+    CachedTool,
+    LLMResponseCache,
+    RecordedTool,
+    create_store,
+    print_cache_stats,
+)
 from agent.run_shell_command_tool import RunShellCommandTool
+from agent.test_runner_tool import RunTestsTool
+from agent.tracing import RunTracer
 
 
 class DeveloperAgent:
@@ -18,7 +38,13 @@ class DeveloperAgent:
         azure_devops_org: Optional[str] = None,
         azure_devops_project: Optional[str] = None,
         azure_devops_repo_id: Optional[str] = None,
-        azure_devops_pat: Optional[str] = None
+        azure_devops_pat: Optional[str] = None,
+        shell_cwd: Optional[str] = None,
+        context_token_budget: int = DEFAULT_TOKEN_BUDGET,
+        trace_path: Optional[str] = None,
+        metrics_path: Optional[str] = None,
+        max_parallel_tools: int = MAX_PARALLEL_TOOLS,
+        response_cache: str = DEFAULT_CACHE_MODE
     ):
         """
         Initializes the DeveloperAgent with a specified codebase path and Azure DevOps PR tool parameters.
@@ -27,19 +53,97 @@ class DeveloperAgent:
         :param azure_devops_project: Azure DevOps project name.
         :param azure_devops_repo_id: Azure DevOps repository ID.
         :param azure_devops_pat: Azure DevOps Personal Access Token.
+        :param shell_cwd: Default working directory for shell commands.
+        :param context_token_budget: Token budget for the tool calls and results sent back to the LLM on each step.
+        :param trace_path: Optional JSONL file for per-call LLM and tool traces.
+        :param metrics_path: Optional file for an OpenMetrics dump of the run.
+        :param max_parallel_tools: Maximum number of read-only tool calls from one model response to run at the same time.
+        :param response_cache: "on" to reuse cached LLM responses and read-only tool results, "replay" to also fail
+            on LLM calls that aren't cached and return the recorded results of the Azure DevOps tools instead of
+            calling Azure DevOps (for reproducing a recorded run), or "off".
         """
+        # The toolkit, LLM client and executor are built on first use, see the properties below
+        self.codebase_path = codebase_path
+        self.azure_devops_org = azure_devops_org
+        self.azure_devops_project = azure_devops_project
+        self.azure_devops_repo_id = azure_devops_repo_id
+        self.azure_devops_pat = azure_devops_pat
+        self.shell_cwd = shell_cwd
+        self.context_compactor = ScratchpadCompactor(token_budget=context_token_budget)
+        self.trace_path = trace_path
+        self.metrics_path = metrics_path
+        self.max_parallel_tools = max_parallel_tools
+        if response_cache not in ("on", "replay", "off"):
+            raise ValueError(f"Unknown response cache mode: {response_cache}")
+        self.response_cache = response_cache
+        self.system_prompt = "You are a developer agent. Your task is to assist with software development tasks."
+
+    @cached_property
+    def tools(self):
         toolkit = FileManagementToolkit(
-            root_dir=str(codebase_path)
+            root_dir=str(self.codebase_path)
         )
         # Load tools for file management and shell commands
-        file_tools = toolkit.get_tools()
-        self.tools = file_tools
-        self.tools.append(RunShellCommandTool())
-        self.tools.append(AzureDevOpsCommentTool())
+        tools = toolkit.get_tools()
+        tools.append(CodebaseIndexTool(str(self.codebase_path)))
+        tools.append(CodeSearchTool(str(self.codebase_path), self.code_searcher))
+        # Partial reads and edits, so the model doesn't resend whole files for small changes
+        tools.append(ReadFileRangeTool(str(self.codebase_path)))
+        tools.append(EditFileTool(str(self.codebase_path)))
+        tools.append(RunShellCommandTool(cwd=self.shell_cwd))
+        # Runs only the tests affected by the changes, with cached results
+        tools.append(RunTestsTool(str(self.codebase_path)))
+        tools.append(AzureDevOpsCommentTool())
         # Add AzureDevOpsPRTool if all required parameters are provided
-        if all([azure_devops_org, azure_devops_project, azure_devops_repo_id, azure_devops_pat]):
-            self.tools.append(AzureDevOpsPRTool())
-        self.system_prompt = "You are a developer agent. Your task is to assist with software development tasks."
+        if all([self.azure_devops_org, self.azure_devops_project, self.azure_devops_repo_id, self.azure_devops_pat]):
+            tools.append(AzureDevOpsPRTool())
+        if self.response_cache != "off":
+            replay = self.response_cache == "replay"
+            tools = [
+                CachedTool(tool, self.cache_store, str(self.codebase_path)) if tool.name in CACHEABLE_TOOLS
+                # A replay doesn't comment on work items or open pull requests again
+                else RecordedTool(tool, self.cache_store, replay) if tool.name in RECORDED_TOOLS
+                else tool
+                for tool in tools
+            ]
+        return tools
+
+    @cached_property
+    def code_searcher(self):
+        return CodeSearcher(str(self.codebase_path))
+
+    @cached_property
+    def cache_store(self):
+        return create_store()
+
+    @cached_property
+    def llm_cache(self):
+        if self.response_cache == "off":
+            return None
+        return LLMResponseCache(self.cache_store, replay=self.response_cache == "replay")
+
+    @cached_property
+    def llm(self):
+        # AI_DEVELOPER_LLM_FACTORY="module:function" swaps in another chat model,
+        # e.g. the scripted model used by the offline benchmarks
+        factory = os.environ.get("AI_DEVELOPER_LLM_FACTORY")
+        if factory:
+            module_name, _, function_name = factory.partition(":")
+            llm = getattr(importlib.import_module(module_name), function_name)()
+        else:
+            llm = AzureChatOpenAI(
+                azure_deployment="gpt-4.1",
+                api_version="2024-12-01-preview",
+                stream_usage=True
+            )
+        if self.llm_cache is not None:
+            llm.cache = self.llm_cache
+            # AgentExecutor streams the model, and streamed calls bypass the cache
+            llm.disable_streaming = True
+        return llm
+
+    @cached_property
+    def agent(self):
         prompt = ChatPromptTemplate.from_messages(
             [
                 ("system", self.system_prompt),
@@ -47,19 +151,19 @@ class DeveloperAgent:
                 MessagesPlaceholder(variable_name="agent_scratchpad"),
             ]
         )
-        self.llm = AzureChatOpenAI(
-            azure_deployment="gpt-4.1",
-            api_version="2024-12-01-preview",
-            stream_usage=True
-        )
-        self.agent = create_tool_calling_agent(
+        return create_tool_calling_agent(
             llm=self.llm,
             tools=self.tools,
             prompt=prompt,
+            message_formatter=self.context_compactor,
         )
-        self.agent_executor = AgentExecutor(
+
+    @cached_property
+    def agent_executor(self):
+        return ParallelToolAgentExecutor(
             agent=self.agent,
             tools=self.tools,
+            max_parallel_tools=self.max_parallel_tools,
             verbose=True,
             max_iterations=40,
             return_intermediate_steps=True,
@@ -74,22 +178,25 @@ class DeveloperAgent:
         """
         print(f"Agent is developing feature with specification:\n{specification}")
         # Initiating LangChain agent execution...
+        tracer = RunTracer(self.trace_path)
         config: RunnableConfig = {
             "configurable": {"session_id": "developer_agent"}, 
-            "max_concurrency": 1
+            # The search tool lists the files again after tools that can change them
+            "callbacks": [tracer, FileListInvalidator(self.code_searcher)]
         }
-        result = self.agent_executor.invoke(
-            {"input": specification}, config=config)
-        
-        # Check if token usage is available and print if it exists
-        if 'token_usage' in result and result['token_usage']:
-            token_usage = result['token_usage']
-            print(f"Prompt tokens used    : {token_usage.get('prompt_tokens', 'N/A')}")
-            print(f"Completion tokens used: {token_usage.get('completion_tokens', 'N/A')}")
-            print(f"Total tokens used     : {token_usage.get('total_tokens', 'N/A')}")
-        else:
-            print("Token usage information not available in result")
-            print(f"Available result keys: {list(result.keys())}")
-        
+        self.context_compactor.step_stats.clear()
+        try:
+            result = self.agent_executor.invoke(
+                {"input": specification}, config=config)
+        finally:
+            tracer.close()
+            self.context_compactor.print_stats()
+            # Token usage and tool timings come from the callbacks, AgentExecutor doesn't return them
+            tracer.print_summary()
+            print_cache_stats(self.llm_cache, self.tools)
+            if self.metrics_path:
+                tracer.write_openmetrics(self.metrics_path)
+        self.last_run_tracer = tracer
+
         response = result["output"]
         return response
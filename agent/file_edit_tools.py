@@ -0,0 +1,305 @@
+import hashlib
+import os
+import re
+import tempfile
+from pathlib import Path
+from langchain.tools import StructuredTool
+from langchain_community.tools.file_management.utils import (
+    INVALID_PATH_TEMPLATE,
+    FileValidationError,
+    get_validated_relative_path,
+)
+from pydantic import BaseModel, Field
+
+DEFAULT_READ_LINES = 200
+MAX_READ_LINES = 1000
+MAX_LINE_CHARS = 2000  # Longer lines (e.g. minified files) are cut in range reads
+HASH_CHARS = 12  # Length of the content hash shown to the model
+HUNK_FUZZ_LINES = 100  # How far a hunk may be from the line numbers in its header
+SNIPPET_CONTEXT_LINES = 3
+MAX_SNIPPET_LINES = 60
+_HUNK_HEADER = re.compile(r"^@@ -(\d+)(?:,(\d+))? \+(\d+)(?:,(\d+))? @@")
+
+
+class ReadFileRangeInput(BaseModel):
+    file_path: str = Field(..., description="Path of the file, relative to the codebase root.")
+    start_line: int = Field(1, description="First line to read, 1-based.")
+    end_line: int | None = Field(None, description=f"Last line to read (inclusive). Defaults to start_line + {DEFAULT_READ_LINES - 1}.")
+
+
+class EditFileInput(BaseModel):
+    file_path: str = Field(..., description="Path of the file to edit, relative to the codebase root.")
+    search: str | None = Field(None, description="Exact text to replace, including enough surrounding lines to be unique in the file.")
+    replace: str | None = Field(None, description="Replacement for 'search'. Use an empty string to delete it.")
+    replace_all: bool = Field(False, description="Replace every occurrence of 'search' instead of requiring exactly one.")
+    diff: str | None = Field(None, description="A unified diff for this file (@@ hunks with ' ', '-' and '+' lines). Use instead of search/replace for several changes.")
+    expected_sha256: str | None = Field(None, description="The sha256 reported by read_file_range. The edit is rejected if the file has changed since.")
+
+
+def _resolve(root_dir: str, file_path: str) -> Path:
+    return get_validated_relative_path(Path(root_dir), file_path)
+
+
+def _short_hash(digest: str) -> str:
+    return digest[:HASH_CHARS]
+
+
+def _number_lines(lines: list[str], first_line: int) -> str:
+    width = len(str(first_line + len(lines)))
+    return "\n".join(f"{n:>{width}}| {line}" for n, line in enumerate(lines, start=first_line))
+
+
+def read_file_range(root_dir: str, file_path: str, start_line: int = 1, end_line: int | None = None) -> str:
+    """
+    Streams the file once, returning the requested lines with line numbers,
+    the total line count and the content hash for edit_file.
+    """
+    try:
+        path = _resolve(root_dir, file_path)
+    except FileValidationError:
+        return INVALID_PATH_TEMPLATE.format(arg_name="file_path", value=file_path)
+    if not path.is_file():
+        return f"Error: no such file: {file_path}"
+    start_line = max(1, start_line)
+    if end_line is None:
+        end_line = start_line + DEFAULT_READ_LINES - 1
+    end_line = min(end_line, start_line + MAX_READ_LINES - 1)
+    digest = hashlib.sha256()
+    lines = []
+    total = 0
+    with open(path, "rb") as f:
+        for total, raw_line in enumerate(f, start=1):
+            digest.update(raw_line)
+            if start_line <= total <= end_line:
+                if b"\0" in raw_line:
+                    return f"Error: {file_path} is a binary file."
+                line = raw_line.decode("utf-8", errors="replace").rstrip("\r\n")
+                if len(line) > MAX_LINE_CHARS:
+                    line = f"{line[:MAX_LINE_CHARS]} ... [{len(line) - MAX_LINE_CHARS} characters cut]"
+                lines.append(line)
+    header = f"{file_path} has {total} lines (sha256: {_short_hash(digest.hexdigest())})."
+    if not lines:
+        return f"{header} There are no lines from {start_line}."
+    last_line = start_line + len(lines) - 1
+    more = f" Read from line {last_line + 1} to continue." if last_line < total else ""
+    return f"{header} Lines {start_line}-{last_line}:{more}\n{_number_lines(lines, start_line)}"
+
+
+def _split_lines(text: str) -> list[str]:
+    """
+    Splits text into lines on \n only, dropping the \r of CRLF endings.
+    str.splitlines() also breaks on form feeds, \x1c-\x1e, \x85 and the
+    Unicode line separators, which would rewrite them as line endings.
+    """
+    lines = text.split("\n")
+    if lines[-1] == "":
+        lines.pop()
+    return [line[:-1] if line.endswith("\r") else line for line in lines]
+
+
+def _parse_hunks(diff: str) -> list[dict]:
+    hunks = []
+    for line in _split_lines(diff.rstrip("\r\n")):
+        header = _HUNK_HEADER.match(line)
+        if header:
+            hunks.append({"old_start": int(header.group(1)), "old": [], "new": []})
+        elif not hunks:
+            continue  # "---" and "+++" file headers
+        elif line.startswith("\\"):
+            continue  # "\ No newline at end of file"
+        elif line.startswith("-"):
+            hunks[-1]["old"].append(line[1:])
+        elif line.startswith("+"):
+            hunks[-1]["new"].append(line[1:])
+        else:
+            # Context line, some models drop the leading space of empty lines
+            hunks[-1]["old"].append(line[1:] if line.startswith(" ") else line)
+            hunks[-1]["new"].append(line[1:] if line.startswith(" ") else line)
+    if not hunks:
+        raise ValueError("the diff has no @@ hunks")
+    return hunks
+
+
+def _find_block(lines: list[str], block: list[str], near: int, search_from: int) -> int | None:
+    """
+    Returns the index where block occurs in lines, closest to near and not
+    before search_from, or None. Trailing whitespace is ignored.
+    """
+    wanted = [line.rstrip() for line in block]
+    for distance in range(HUNK_FUZZ_LINES + 1):
+        for start in (near - distance, near + distance) if distance else (near,):
+            if search_from <= start <= len(lines) - len(block) and all(
+                lines[start + i].rstrip() == wanted[i] for i in range(len(block))
+            ):
+                return start
+    return None
+
+
+def _apply_diff(lines: list[str], diff: str) -> tuple[list[str], list[tuple[int, int]]]:
+    """
+    Applies the hunks of a unified diff to lines (without line endings).
+    Returns the new lines and the changed (start, end) line ranges.
+    """
+    result = []
+    changed = []
+    position = 0
+    offset = 0
+    for number, hunk in enumerate(_parse_hunks(diff), start=1):
+        if hunk["old"]:
+            start = _find_block(lines, hunk["old"], hunk["old_start"] - 1, position)
+        else:
+            start = min(max(hunk["old_start"], position), len(lines))  # Pure insertion after old_start
+        if start is None:
+            found = lines[hunk["old_start"] - 1:hunk["old_start"] - 1 + len(hunk["old"])]
+            raise ValueError(
+                f"hunk {number} doesn't match the file near line {hunk['old_start']}. Expected:\n"
+                + "\n".join(hunk["old"]) + "\nFound:\n" + "\n".join(found)
+            )
+        result.extend(lines[position:start])
+        changed.append((start + offset + 1, start + offset + len(hunk["new"])))
+        result.extend(hunk["new"])
+        offset += len(hunk["new"]) - len(hunk["old"])
+        position = start + len(hunk["old"])
+    result.extend(lines[position:])
+    return result, changed
+
+
+def _snippet(lines: list[str], changed: list[tuple[int, int]]) -> str:
+    shown = []
+    budget = MAX_SNIPPET_LINES
+    for start, end in changed:
+        first = max(1, start - SNIPPET_CONTEXT_LINES)
+        last = min(len(lines), max(end, start) + SNIPPET_CONTEXT_LINES, first + budget - 1)
+        if last < first or budget <= 0:
+            break
+        shown.append(f"Lines {first}-{last} after the edit:\n{_number_lines(lines[first - 1:last], first)}")
+        budget -= last - first + 1
+    return "\n".join(shown)
+
+
+def edit_file(
+    root_dir: str,
+    file_path: str,
+    search: str | None = None,
+    replace: str | None = None,
+    replace_all: bool = False,
+    diff: str | None = None,
+    expected_sha256: str | None = None,
+) -> str:
+    """
+    Applies a search/replace or unified diff edit to an existing file and
+    returns the changed lines, so the model doesn't have to re-read the file.
+    The file is read once and the result written through a temporary file.
+    """
+    try:
+        path = _resolve(root_dir, file_path)
+    except FileValidationError:
+        return INVALID_PATH_TEMPLATE.format(arg_name="file_path", value=file_path)
+    if not path.is_file():
+        return f"Error: no such file: {file_path}. Use write_file to create new files."
+    if (search is None) == (diff is None):
+        return "Error: pass either search and replace, or diff."
+    stat = path.stat()
+    data = path.read_bytes()
+    digest = hashlib.sha256(data).hexdigest()
+    if expected_sha256 and not digest.startswith(expected_sha256.strip().lower()):
+        return (f"Error: {file_path} has changed since it was read (sha256 is {_short_hash(digest)}, "
+                f"expected {expected_sha256}). Read it again before editing.")
+    try:
+        text = data.decode("utf-8")
+    except UnicodeDecodeError:
+        return f"Error: {file_path} is not a UTF-8 text file."
+    newline = "\r\n" if "\r\n" in text else "\n"
+    ends_with_newline = text.endswith("\n")
+    lines = _split_lines(text)
+
+    try:
+        if diff is not None:
+            new_lines, changed = _apply_diff(lines, diff)
+        else:
+            if not search:
+                return "Error: search must not be empty."
+            if replace is None:
+                return "Error: pass replace together with search. Use an empty string to delete the search text."
+            text_lf = text.replace("\r\n", "\n")
+            search = search.replace("\r\n", "\n")
+            replace = replace.replace("\r\n", "\n")
+            count = text_lf.count(search)
+            if count == 0:
+                return (f"Error: search text not found in {file_path}. It must match the file exactly, "
+                        "including indentation; read the lines again with read_file_range.")
+            if count > 1 and not replace_all:
+                return (f"Error: search text occurs {count} times in {file_path}. "
+                        "Include more surrounding lines to make it unique, or set replace_all.")
+            # Line ranges of the replacements in the new text
+            line_delta = replace.count("\n") - search.count("\n")
+            changed = []
+            index = text_lf.find(search)
+            while index != -1:
+                start = text_lf.count("\n", 0, index) + 1 + line_delta * len(changed)
+                changed.append((start, start + replace.count("\n")))
+                index = text_lf.find(search, index + len(search))
+            new_lines = _split_lines(text_lf.replace(search, replace))
+    except ValueError as e:
+        return f"Error: {e}"
+
+    new_text = newline.join(new_lines) + (newline if ends_with_newline and new_lines else "")
+    new_data = new_text.encode("utf-8")
+    if new_data == data:
+        return f"No changes: the edit leaves {file_path} as it is."
+    current = path.stat()
+    if (current.st_mtime_ns, current.st_size) != (stat.st_mtime_ns, stat.st_size):
+        return f"Error: {file_path} was modified while the edit was applied, try again."
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(new_data)
+        os.chmod(tmp_path, stat.st_mode & 0o7777)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    added = max(0, len(new_lines) - len(lines))
+    removed = max(0, len(lines) - len(new_lines))
+    return (
+        f"Edited {file_path}: {len(changed)} change(s), {len(new_lines)} lines (+{added} -{removed}), "
+        f"sha256: {_short_hash(hashlib.sha256(new_data).hexdigest())}.\n{_snippet(new_lines, changed)}"
+    )
+
+
+class ReadFileRangeTool(StructuredTool):
+    """
+    StructuredTool for reading a range of lines from a file.
+    """
+
+    def __init__(self, root_dir: str):
+        super().__init__(
+            func=lambda file_path, start_line=1, end_line=None: read_file_range(root_dir, file_path, start_line, end_line),
+            name="read_file_range",
+            description=(
+                "Read a range of lines from a file, with line numbers, the file's total line count and its sha256. "
+                f"Reads {DEFAULT_READ_LINES} lines from start_line unless end_line is given. Prefer it over read_file for large files."
+            ),
+            args_schema=ReadFileRangeInput,
+        )
+
+
+class EditFileTool(StructuredTool):
+    """
+    StructuredTool for editing part of an existing file.
+    """
+
+    def __init__(self, root_dir: str):
+        super().__init__(
+            func=lambda file_path, search=None, replace=None, replace_all=False, diff=None, expected_sha256=None: edit_file(
+                root_dir, file_path, search, replace, replace_all, diff, expected_sha256
+            ),
+            name="edit_file",
+            description=(
+                "Change part of an existing file without rewriting it: replace an exact 'search' text with 'replace', "
+                "or apply a unified 'diff'. Pass the sha256 from read_file_range as expected_sha256. Returns the changed lines. "
+                "Use it instead of write_file for changes to existing files."
+            ),
+            args_schema=EditFileInput,
+        )
@@ -0,0 +1,79 @@
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+from langchain.agents import AgentExecutor
+from langchain_core.agents import AgentAction, AgentStep
+from langchain_core.callbacks import CallbackManagerForChainRun
+from langchain_core.tools import BaseTool
+from pydantic import PrivateAttr
+
+MAX_PARALLEL_TOOLS = 8
+# Tools without side effects. Consecutive calls to these run in parallel, any
+# other tool runs on its own after the calls before it have finished.
+READ_ONLY_TOOLS = frozenset({
+    "read_file",
+    "list_directory",
+    "file_search",
+    "codebase_index",
+    "read_file_range",
+    "search_code",
+})
+
+
+class ParallelToolAgentExecutor(AgentExecutor):
+    """
+    AgentExecutor that runs the independent tool calls of one model response
+    concurrently on a bounded thread pool.
+
+    Calls are split into groups in the order the model made them: a run of
+    read-only calls forms one parallel group, every other call is a group of
+    its own. Groups run one after another, so a read that follows a write
+    still sees the written file.
+    """
+
+    max_parallel_tools: int = MAX_PARALLEL_TOOLS
+    read_only_tools: frozenset[str] = READ_ONLY_TOOLS
+    _step_actions: list = PrivateAttr(default_factory=list)
+    _step_results: dict = PrivateAttr(default_factory=dict)
+
+    def _iter_next_step(self, name_to_tool_map, color_mapping, inputs, intermediate_steps, run_manager=None):
+        # AgentExecutor yields all actions of a step before performing the
+        # first one, so the whole batch is known when _perform_agent_action runs
+        self._step_actions = []
+        self._step_results = {}
+        for item in super()._iter_next_step(name_to_tool_map, color_mapping, inputs, intermediate_steps, run_manager):
+            if isinstance(item, AgentAction):
+                self._step_actions.append(item)
+            yield item
+
+    def _perform_agent_action(
+        self,
+        name_to_tool_map: dict[str, BaseTool],
+        color_mapping: dict[str, str],
+        agent_action: AgentAction,
+        run_manager: Optional[CallbackManagerForChainRun] = None,
+    ) -> AgentStep:
+        if len(self._step_actions) < 2 or not any(a is agent_action for a in self._step_actions):
+            return super()._perform_agent_action(name_to_tool_map, color_mapping, agent_action, run_manager)
+        if not self._step_results:
+            self._perform_step_actions(name_to_tool_map, color_mapping, run_manager)
+        return self._step_results.pop(id(agent_action))
+
+    def _perform_step_actions(self, name_to_tool_map, color_mapping, run_manager):
+        def perform(action):
+            return AgentExecutor._perform_agent_action(self, name_to_tool_map, color_mapping, action, run_manager)
+
+        groups = []
+        for action in self._step_actions:
+            if action.tool in self.read_only_tools and groups and groups[-1][0].tool in self.read_only_tools:
+                groups[-1].append(action)
+            else:
+                groups.append([action])
+        for group in groups:
+            if len(group) == 1:
+                steps = [perform(group[0])]
+            else:
+                with ThreadPoolExecutor(max_workers=min(len(group), self.max_parallel_tools)) as pool:
+                    steps = list(pool.map(perform, group))
+            for action, step in zip(group, steps):
+                self._step_results[id(action)] = step
@@ -0,0 +1,315 @@
+import hashlib
+import json
+import os
+import re
+import threading
+from typing import Any
+
+from langchain_core.caches import BaseCache
+from langchain_core.load import dumps, loads
+from langchain_core.tools import BaseTool
+
+from agent.cache_dir import get_cache_dir
+from agent.codebase_index_tool import list_codebase_files
+
+CACHE_VERSION = 1
+# "on" reads and writes the cache, "replay" also fails on an LLM call that
+# isn't cached instead of calling the model, "off" disables it
+CACHE_MODES = ("on", "replay", "off")
+DEFAULT_CACHE_MODE = os.environ.get("AI_DEVELOPER_RESPONSE_CACHE", "on")
+DEFAULT_MAX_BYTES = int(float(os.environ.get("AI_DEVELOPER_RESPONSE_CACHE_MB", "512")) * 1024 * 1024)
+EVICT_TO = 0.9  # Eviction frees space down to this fraction of the budget
+# Message fields that differ between runs without changing what the model sees
+VOLATILE_MESSAGE_FIELDS = {"id", "response_metadata", "usage_metadata"}
+# Output that differs between otherwise identical runs (timings, index
+# stats, commit hashes and dates), masked in cache keys. Only the output of
+# the tools listed in VOLATILE_TOOL_OUTPUT is masked; file contents never are.
+_DURATION = (re.compile(r"\b\d+(?:\.\d+)?s\b"), "<seconds>s")  # E.g. "in 0.12s"
+_TIMESTAMP = (re.compile(r"\d{4}-\d{2}-\d{2}[T ]\d{2}:\d{2}:\d{2}(?:\.\d+)?(?:Z|[+-]\d{2}:?\d{2})?"), "<time>")
+_COMMIT_HASH = (re.compile(r"\b(?=[0-9a-f]*[a-f])(?=[0-9a-f]*\d)[0-9a-f]{7,40}\b"), "<hash>")
+VOLATILE_TOOL_OUTPUT = {
+    "run_shell_command": [_DURATION, _TIMESTAMP, _COMMIT_HASH],
+    "run_tests": [_DURATION, _TIMESTAMP, (re.compile(r"\b\d+ results from cache\b"), "<n> results from cache")],
+    "codebase_index": [
+        (re.compile(r"\(\d+ added, \d+ updated, \d+ removed since last call\) in \d+\.\d+s\."), "(<index changes>) in <seconds>s."),
+    ],
+    "search_code": [(re.compile(r"files searched in \d+\.\d+s\)"), "files searched in <seconds>s)")],
+}
+# Read-only tools whose results are cached, with what their result depends
+# on: "file" is the content of the file_path argument, "tree" is the list of
+# files of the codebase with their sizes and modification times. The
+# list_directory and file_search tools aren't cached: they also see ignored
+# files and empty directories, and walking the tree for a fingerprint costs
+# as much as running them.
+CACHEABLE_TOOLS = {
+    "read_file": "file",
+    "read_file_range": "file",
+    "codebase_index": "tree",
+    "search_code": "tree",
+}
+# Tools with effects outside the checkout. Their results are recorded, and
+# a replay returns the recorded result instead of running them again.
+RECORDED_TOOLS = {"add_azure_devops_work_item_comment", "create_azure_devops_pull_request"}
+
+
+class ReplayMissError(RuntimeError):
+    """
+    Raised in replay mode when the run asks the model something that isn't cached.
+    """
+
+
+def cache_key(*parts) -> str:
+    return hashlib.sha256(json.dumps([CACHE_VERSION, *parts], sort_keys=True, default=str).encode()).hexdigest()
+
+
+class ContentStore:
+    """
+    On-disk content-addressed store: one file per key, written atomically.
+    Reading an entry refreshes its modification time, and the least recently
+    used entries are deleted once the store grows beyond max_bytes.
+    """
+
+    def __init__(self, root: str, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.root = root
+        self.max_bytes = max_bytes
+        self._size = None
+        self._lock = threading.Lock()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.root, key[:2], f"{key}.json")
+
+    def get(self, key: str) -> str | None:
+        path = self._path(key)
+        try:
+            with open(path, encoding="utf-8") as f:
+                value = f.read()
+        except OSError:
+            return None
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return value
+
+    def put(self, key: str, value: str):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(value)
+        os.replace(tmp_path, path)
+        with self._lock:
+            if self._size is None:
+                self._size = sum(size for _, _, size in self._entries())
+            else:
+                self._size += len(value.encode("utf-8"))
+            if self._size > self.max_bytes:
+                self._evict()
+
+    def _entries(self) -> list[tuple[float, str, int]]:
+        entries = []
+        for directory in os.scandir(self.root):
+            if not directory.is_dir():
+                continue
+            for entry in os.scandir(directory.path):
+                if entry.name.endswith(".json"):
+                    try:
+                        stat = entry.stat()
+                    except OSError:
+                        continue
+                    entries.append((stat.st_mtime, entry.path, stat.st_size))
+        return entries
+
+    def _evict(self):
+        entries = sorted(self._entries())
+        self._size = sum(size for _, _, size in entries)
+        for _, path, size in entries:
+            if self._size <= self.max_bytes * EVICT_TO:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            self._size -= size
+
+
+def _normalize_messages(prompt: str):
+    """
+    Drops message IDs and response metadata from the serialized prompt and
+    masks volatile tool output, so that a rerun produces the same key.
+    """
+    messages = json.loads(prompt)
+    tool_names = {}  # Tool call ID -> tool name, from the AI messages that made the calls
+    for message in messages:
+        kwargs = message.get("kwargs", {}) if isinstance(message, dict) else {}
+        for tool_call in kwargs.get("tool_calls") or []:
+            tool_names[tool_call.get("id")] = tool_call.get("name")
+        if message.get("id", [])[-1:] == ["ToolMessage"] and isinstance(kwargs.get("content"), str):
+            name = kwargs.get("name") or tool_names.get(kwargs.get("tool_call_id"))
+            for pattern, replacement in VOLATILE_TOOL_OUTPUT.get(name, []):
+                kwargs["content"] = pattern.sub(replacement, kwargs["content"])
+        for field in VOLATILE_MESSAGE_FIELDS:
+            kwargs.pop(field, None)
+    return messages
+
+
+class LLMResponseCache(BaseCache):
+    """
+    LangChain cache for chat model responses, keyed by the normalized
+    messages and the model's configuration string, which includes the
+    deployment and the schemas of the bound tools.
+    """
+
+    def __init__(self, store: ContentStore, replay: bool = False):
+        self.store = store
+        self.replay = replay
+        self.hits = 0
+        self.misses = 0
+
+    def _key(self, prompt: str, llm_string: str) -> str:
+        return cache_key("llm", _normalize_messages(prompt), llm_string)
+
+    def lookup(self, prompt: str, llm_string: str):
+        value = self.store.get(self._key(prompt, llm_string))
+        if value is None:
+            self.misses += 1
+            if self.replay:
+                raise ReplayMissError(
+                    f"Replay diverged: LLM call {self.hits + self.misses} isn't in the response cache"
+                )
+            return None
+        self.hits += 1
+        generations = [loads(generation) for generation in json.loads(value)]
+        for generation in generations:
+            message = getattr(generation, "message", None)
+            if message is not None:
+                # Nothing was spent on this call, see RunTracer
+                message.response_metadata = {**message.response_metadata, "cache_hit": True}
+                message.usage_metadata = {"input_tokens": 0, "output_tokens": 0, "total_tokens": 0}
+        return generations
+
+    def update(self, prompt: str, llm_string: str, return_val):
+        self.store.put(self._key(prompt, llm_string), json.dumps([dumps(generation) for generation in return_val]))
+
+    def clear(self, **kwargs: Any):
+        pass  # Entries age out through the store's eviction
+
+
+def file_fingerprint(root_dir: str, file_path: str) -> str | None:
+    path = os.path.join(root_dir, file_path)
+    digest = hashlib.sha256()
+    try:
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(chunk)
+    except OSError:
+        return None
+    return digest.hexdigest()
+
+
+def tree_fingerprint(root_dir: str) -> str:
+    digest = hashlib.sha256()
+    for rel_path in list_codebase_files(root_dir):
+        try:
+            stat = os.stat(os.path.join(root_dir, rel_path))
+        except OSError:
+            continue
+        digest.update(f"{rel_path}\0{stat.st_size}\0{stat.st_mtime_ns}\n".encode("utf-8", errors="replace"))
+    return digest.hexdigest()
+
+
+class CachedTool(BaseTool):
+    """
+    Wraps a read-only tool and reuses its earlier result while the files it
+    depends on (see CACHEABLE_TOOLS) are unchanged.
+    """
+
+    tool: BaseTool
+    store: Any
+    root_dir: str
+    depends_on: str
+    hits: int = 0
+    misses: int = 0
+
+    def __init__(self, tool: BaseTool, store: ContentStore, root_dir: str):
+        super().__init__(
+            name=tool.name,
+            description=tool.description,
+            args_schema=tool.args_schema,
+            tool=tool,
+            store=store,
+            root_dir=os.path.abspath(root_dir),
+            depends_on=CACHEABLE_TOOLS[tool.name],
+        )
+
+    def _run(self, run_manager=None, **kwargs) -> str:
+        if self.depends_on == "file":
+            fingerprint = file_fingerprint(self.root_dir, str(kwargs.get("file_path", "")))
+        else:
+            fingerprint = tree_fingerprint(self.root_dir)
+        if fingerprint is None:
+            return self._invoke_tool(kwargs)
+        key = cache_key("tool", self.name, self.root_dir, kwargs, fingerprint)
+        value = self.store.get(key)
+        if value is not None:
+            self.hits += 1
+            return json.loads(value)
+        self.misses += 1
+        result = self._invoke_tool(kwargs)
+        if isinstance(result, str):
+            self.store.put(key, json.dumps(result))
+        return result
+
+    def _invoke_tool(self, kwargs: dict):
+        # Without callbacks, so that tracers record the call once, as this tool's run
+        return self.tool.invoke(kwargs, config={"callbacks": []})
+
+
+class RecordedTool(BaseTool):
+    """
+    Wraps a tool with effects outside the checkout (see RECORDED_TOOLS). It
+    runs the tool and records its result, or in replay mode returns the
+    recorded result of a call with the same arguments without running it.
+    """
+
+    tool: BaseTool
+    store: Any
+    replay: bool = False
+
+    def __init__(self, tool: BaseTool, store: ContentStore, replay: bool = False):
+        super().__init__(
+            name=tool.name,
+            description=tool.description,
+            args_schema=tool.args_schema,
+            tool=tool,
+            store=store,
+            replay=replay,
+        )
+
+    def _run(self, run_manager=None, **kwargs) -> str:
+        key = cache_key("recorded", self.name, kwargs)
+        if self.replay:
+            value = self.store.get(key)
+            if value is None:
+                raise ReplayMissError(f"Replay diverged: {self.name} wasn't called with these arguments in the recorded run")
+            return json.loads(value)
+        # Without callbacks, so that tracers record the call once, as this tool's run
+        result = self.tool.invoke(kwargs, config={"callbacks": []})
+        if isinstance(result, str):
+            self.store.put(key, json.dumps(result))
+        return result
+
+
+def create_store(max_bytes: int = DEFAULT_MAX_BYTES) -> ContentStore:
+    return ContentStore(get_cache_dir("responses"), max_bytes)
+
+
+def print_cache_stats(llm_cache: LLMResponseCache | None, tools: list[BaseTool]):
+    cached_tools = [tool for tool in tools if isinstance(tool, CachedTool)]
+    if llm_cache is None and not cached_tools:
+        return
+    llm_hits = llm_cache.hits if llm_cache else 0
+    llm_calls = llm_hits + (llm_cache.misses if llm_cache else 0)
+    tool_hits = sum(tool.hits for tool in cached_tools)
+    tool_calls = tool_hits + sum(tool.misses for tool in cached_tools)
+    print(f"Response cache        : {llm_hits}/{llm_calls} LLM calls, {tool_hits}/{tool_calls} tool calls served from cache")
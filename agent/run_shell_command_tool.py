@@ -1,41 +1,203 @@
+import os
+import re
+import signal
 import subprocess
+import threading
+import time
+from dataclasses import dataclass
 from langchain.tools import StructuredTool
 from pydantic import BaseModel, Field
 
+COMMAND_TIMEOUT = 120  # Seconds
+HEAD_BYTES = 5000  # Bytes kept from the start of each output stream
+TAIL_BYTES = 15000  # Bytes kept from the end of each output stream, where errors usually are
+MAX_OUTPUT_BYTES = int(os.environ.get("AI_DEVELOPER_MAX_OUTPUT_BYTES", 10 * 1024 * 1024))  # Stop the command after this much output
+READ_CHUNK_BYTES = 65536
+KILL_GRACE_SECONDS = 5  # How long the readers may still take after the command's processes are killed
+
 class RunShellCommandInput(BaseModel):
     command: str = Field(..., description="The shell command to execute.")
     cwd: str | None = Field(None, description="Optional working directory to run the command in.")
+    failure_pattern: str | None = Field(
+        None,
+        description="Optional regular expression. The command is stopped as soon as an output line matches it, e.g. 'error TS\\d+|FAILED'."
+    )
+
+class HeadTailBuffer:
+    """
+    Keeps the first head_size and the last tail_size bytes written to it and
+    counts everything in between as dropped, so memory stays bounded no
+    matter how much a command prints.
+    """
+
+    def __init__(self, head_size: int = HEAD_BYTES, tail_size: int = TAIL_BYTES):
+        self.head_size = head_size
+        self.tail_size = tail_size
+        self.head = bytearray()
+        self.tail = bytearray()
+        self.total_bytes = 0
+        self.dropped_bytes = 0
+
+    def write(self, data: bytes):
+        self.total_bytes += len(data)
+        if len(self.head) < self.head_size:
+            take = self.head_size - len(self.head)
+            self.head += data[:take]
+            data = data[take:]
+        self.tail += data
+        overflow = len(self.tail) - self.tail_size
+        if overflow > 0:
+            del self.tail[:overflow]
+            self.dropped_bytes += overflow
+
+    def getvalue(self) -> str:
+        head = self.head.decode("utf-8", errors="replace")
+        tail = self.tail.decode("utf-8", errors="replace")
+        if self.dropped_bytes:
+            return f"{head}\n... [{self.dropped_bytes} bytes dropped] ...\n{tail}"
+        return head + tail
 
-def run_shell_command(command: str, cwd: str | None = None) -> str:
+@dataclass
+class StreamingCommandResult:
+    returncode: int | None
+    stdout: str
+    stderr: str
+    elapsed_seconds: float
+    dropped_bytes: int
+    total_bytes: int
+    stop_reason: str | None = None  # Why the command was stopped early, if it was
+
+def _kill(process: subprocess.Popen):
+    # The command runs in its own process group so that shell children die with it
     try:
-        result = subprocess.run(
-            command,
-            shell=True,
-            cwd=cwd,
-            capture_output=True,
-            text=True,
-            timeout=120
-        )
-        if result.returncode == 0:
-            # Make sure that the output doesn't exceed 20k characters
-            # Display first 20k characters if it does
-            if len(result.stdout) > 20000:
-                return f"Output too long to display (exceeds 20,000 characters). First 20,000 characters:\n{result.stdout[:20000]}"
-            return result.stdout.strip() or "Command executed successfully with no output."
+        if hasattr(os, "killpg"):
+            os.killpg(process.pid, signal.SIGKILL)
         else:
-            # Make sure that the error output doesn't exceed 20k characters
-            # Display first 20k characters if it does
-            if len(result.stderr) > 20000:
-                return f"Error output too long to display (exceeds 20,000 characters). First 20,000 characters:\n{result.stderr[:20000]}"
-            return f"Error (code {result.returncode}): {result.stdout.strip()}\n{result.stderr.strip()}"
+            process.kill()
+    except (ProcessLookupError, PermissionError):
+        pass
+
+def run_streaming_command(
+    command: str,
+    cwd: str | None = None,
+    timeout: float = COMMAND_TIMEOUT,
+    max_output_bytes: int = MAX_OUTPUT_BYTES,
+    failure_pattern: str | None = None,
+) -> StreamingCommandResult:
+    """
+    Runs a shell command and reads its output incrementally into bounded
+    head+tail buffers. The command is stopped early when it times out, prints
+    more than max_output_bytes in total or prints a line matching failure_pattern.
+    """
+    pattern = re.compile(failure_pattern.encode()) if failure_pattern else None
+    start = time.perf_counter()
+    process = subprocess.Popen(
+        command,
+        shell=True,
+        cwd=cwd,
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        start_new_session=hasattr(os, "killpg"),
+    )
+    buffers = {"stdout": HeadTailBuffer(), "stderr": HeadTailBuffer()}
+    lock = threading.Lock()
+    stop = {"reason": None}
+
+    def request_stop(reason):
+        with lock:
+            if stop["reason"] is None:
+                stop["reason"] = reason
+                _kill(process)
+
+    def reader(stream, buffer):
+        with stream:
+            read_stream(stream, buffer)
+
+    def read_stream(stream, buffer):
+        pending = b""  # Incomplete last line, kept for failure pattern matching
+        while True:
+            chunk = stream.read1(READ_CHUNK_BYTES)
+            if not chunk:
+                break
+            with lock:
+                buffer.write(chunk)
+                total = sum(b.total_bytes for b in buffers.values())
+            if total > max_output_bytes:
+                request_stop(f"output exceeded {max_output_bytes} bytes")
+            if pattern:
+                lines = (pending + chunk).split(b"\n")
+                pending = lines.pop()[-READ_CHUNK_BYTES:]
+                for line in lines:
+                    if pattern.search(line):
+                        request_stop(f"output matched failure pattern: {line.decode('utf-8', errors='replace').strip()[:200]}")
+                        break
+        if pattern and pending and pattern.search(pending):
+            request_stop(f"output matched failure pattern: {pending.decode('utf-8', errors='replace').strip()[:200]}")
+
+    threads = [
+        threading.Thread(target=reader, args=(process.stdout, buffers["stdout"]), daemon=True),
+        threading.Thread(target=reader, args=(process.stderr, buffers["stderr"]), daemon=True),
+    ]
+    for thread in threads:
+        thread.start()
+    deadline = time.monotonic() + timeout
+    try:
+        process.wait(timeout=timeout)
+    except subprocess.TimeoutExpired:
+        request_stop(f"timed out after {timeout} seconds")
+        process.wait()
+    # Background children (e.g. "server &") can keep the pipes open after the
+    # shell has exited, so the readers only get until the deadline
+    for thread in threads:
+        thread.join(max(0.0, deadline - time.monotonic()))
+    if any(thread.is_alive() for thread in threads):
+        request_stop(f"background processes kept the output open for more than {timeout} seconds and were stopped")
+        _kill(process)
+        for thread in threads:
+            thread.join(KILL_GRACE_SECONDS)
+    with lock:
+        stdout, stderr = buffers["stdout"].getvalue(), buffers["stderr"].getvalue()
+    return StreamingCommandResult(
+        returncode=process.returncode,
+        stdout=stdout,
+        stderr=stderr,
+        elapsed_seconds=time.perf_counter() - start,
+        dropped_bytes=sum(b.dropped_bytes for b in buffers.values()),
+        total_bytes=sum(b.total_bytes for b in buffers.values()),
+        stop_reason=stop["reason"],
+    )
+
+def run_shell_command(command: str, cwd: str | None = None, failure_pattern: str | None = None) -> str:
+    try:
+        result = run_streaming_command(command, cwd=cwd, failure_pattern=failure_pattern)
+        summary = f"[{result.elapsed_seconds:.1f}s, {result.total_bytes} bytes of output, {result.dropped_bytes} bytes dropped]"
+        if result.stop_reason:
+            return (
+                f"Command stopped early ({result.stop_reason}) {summary}\n"
+                f"{result.stdout.strip()}\n{result.stderr.strip()}"
+            ).strip()
+        if result.returncode == 0:
+            # Long output is trimmed to its first and last bytes, the dropped middle is reported
+            output = result.stdout.strip() or "Command executed successfully with no output."
+            return f"{output}\n{summary}" if result.dropped_bytes or result.elapsed_seconds >= 1 else output
+        return f"Error (code {result.returncode}) {summary}: {result.stdout.strip()}\n{result.stderr.strip()}"
     except Exception as e:
         return f"Exception while running command: {e}"
 
 class RunShellCommandTool(StructuredTool):
-    def __init__(self):
+    def __init__(self, cwd: str | None = None):
+        # Commands without an explicit cwd run in the default working directory
+        default_cwd = cwd
         super().__init__(
-            func=run_shell_command,
+            func=lambda command, cwd=None, failure_pattern=None: run_shell_command(
+                command, cwd=cwd or default_cwd, failure_pattern=failure_pattern
+            ),
             name="run_shell_command",
-            description="Run a shell command on the local system. Accepts 'command' (str) and optional 'cwd' (str) for working directory.",
+            description=(
+                "Run a shell command on the local system. Accepts 'command' (str), optional 'cwd' (str) for working directory "
+                "and optional 'failure_pattern' (regex) to stop the command as soon as a matching line is printed. "
+                "Long output is trimmed to its beginning and end."
+            ),
             args_schema=RunShellCommandInput,
         )
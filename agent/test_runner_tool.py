@@ -0,0 +1,511 @@
+import ast
+import json
+import os
+import re
+import shlex
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from langchain.tools import StructuredTool
+from pydantic import BaseModel, Field
+
+from agent.cache_dir import get_cache_dir
+from agent.codebase_index_tool import file_sha1, list_codebase_files, path_prefix
+from agent.response_cache import ContentStore, cache_key
+from agent.run_shell_command_tool import run_streaming_command
+
+TEST_FILE_TIMEOUT = 120  # Seconds per test file
+TEST_WORKERS = int(os.environ.get("AI_DEVELOPER_TEST_WORKERS", min(4, os.cpu_count() or 1)))
+# Interpreter of the codebase's environment, the agent's own by default
+TEST_PYTHON = os.environ.get("AI_DEVELOPER_TEST_PYTHON", sys.executable)
+TEST_CACHE_MAX_BYTES = 64 * 1024 * 1024
+MAX_PARSE_BYTES = 1024 * 1024
+FAILURE_TAIL_LINES = 25  # Output lines shown per failed test file
+MAX_OUTPUT_CHARS = 12000
+# Files whose content changes how every test runs, part of every cache key
+CONFIG_FILES = [
+    "pytest.ini", "pyproject.toml", "setup.cfg", "tox.ini", "requirements.txt", "uv.lock", "poetry.lock",
+    "package.json", "package-lock.json", "yarn.lock", "pnpm-lock.yaml", "tsconfig.json",
+]
+JS_EXTENSIONS = (".js", ".jsx", ".mjs", ".cjs", ".ts", ".tsx", ".mts", ".cts")
+_TEST_FILE_NAME = re.compile(r"(^test_.*|.*_test)\.py$")
+_JS_TEST_FILE = re.compile(r"(^|/)__tests__/.*\.[cm]?[jt]sx?$|\.(test|spec)\.[cm]?[jt]sx?$")
+# Module specifiers of import/export ... from, import(), bare import and require()
+_JS_IMPORT = re.compile(r"""(?:\bfrom\s*|\bimport\s*\(?\s*|\brequire\s*\(\s*)["']([^"'\n]+)["']""")
+_JS_TEST_COUNTS = re.compile(r"(\d+) (passed|failed|skipped|todo|passing|failing|pending)")
+_TAP_TEST_COUNTS = re.compile(r"^# (pass|fail|skipped|todo) (\d+)$", re.MULTILINE)  # node --test
+_JS_FAILURE = re.compile(r"^\s*(?:●|FAIL|×|✕|not ok \d+ -)\s+(.+?)\s*$", re.MULTILINE)
+_PYTEST_SUMMARY = re.compile(r"(\d+) (passed|failed|errors?|skipped|xfailed|xpassed)")
+_PYTEST_FAILURE = re.compile(r"^(FAILED|ERROR) (\S+)")
+_UNITTEST_RAN = re.compile(r"^Ran (\d+) tests?", re.MULTILINE)
+_UNITTEST_FAILURE = re.compile(r"^(FAIL|ERROR): (\S+) \((\S+?)\)", re.MULTILINE)
+_UNITTEST_COUNTS = re.compile(r"(failures|errors|skipped)=(\d+)")
+
+
+class RunTestsInput(BaseModel):
+    changed_files: list[str] | None = Field(
+        None,
+        description="Files changed since the tests last passed, relative to the codebase root. Defaults to the uncommitted changes reported by git."
+    )
+    scope: str = Field("changed", description="'changed' runs the tests affected by the changed files, 'all' every test file.")
+    test_files: list[str] | None = Field(None, description="Run exactly these test files instead, relative to the codebase root.")
+    use_cache: bool = Field(True, description="Reuse earlier results of test files whose code and dependencies haven't changed.")
+
+
+def _parse_python(path: str) -> tuple[list[tuple[int, str | None, list[str]]], bool]:
+    """
+    Returns the imports of a Python file as (level, module, names) tuples and
+    whether it defines tests (test functions or TestCase classes).
+    """
+    try:
+        if os.path.getsize(path) > MAX_PARSE_BYTES:
+            return [], False
+        with open(path, "rb") as f:
+            tree = ast.parse(f.read())
+    except (OSError, SyntaxError, ValueError):
+        return [], False
+    imports = []
+    has_tests = False
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            imports.extend((0, alias.name, []) for alias in node.names)
+        elif isinstance(node, ast.ImportFrom):
+            imports.append((node.level, node.module, [alias.name for alias in node.names]))
+        elif isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)) and node.name.startswith("test"):
+            has_tests = True
+        elif isinstance(node, ast.ClassDef) and any("TestCase" in ast.unparse(base) for base in node.bases):
+            has_tests = True
+    return imports, has_tests
+
+
+def _parse_js(path: str) -> list[str]:
+    """
+    Returns the module specifiers a JavaScript or TypeScript file imports or requires.
+    """
+    try:
+        if os.path.getsize(path) > MAX_PARSE_BYTES:
+            return []
+        with open(path, encoding="utf-8", errors="replace") as f:
+            return _JS_IMPORT.findall(f.read())
+    except OSError:
+        return []
+
+
+def _is_source(rel_path: str) -> bool:
+    return rel_path.endswith((".py", *JS_EXTENSIONS))
+
+
+def _failure_output(output: str) -> str:
+    # Skip the per-test progress lines of verbose unittest output
+    start = output.find("\n" + "=" * 70)
+    return output[start + 1:] if start != -1 else output
+
+
+class TestRunner:
+    """
+    Finds the test files affected by a change through the import graph of
+    the codebase, runs them in parallel and caches each file's result under a
+    hash of the test file, its local dependencies (imported modules, packages'
+    __init__.py and pytest conftest.py files), the non-source files next to
+    it and the test configuration. Python tests run with pytest or unittest,
+    JavaScript and TypeScript tests (*.test.*, *.spec.* and __tests__/) with
+    the package's npm test script. Parsed imports are reused while a file is unchanged.
+    """
+
+    def __init__(self, codebase_path: str, store: ContentStore | None = None):
+        self.codebase_path = os.path.abspath(codebase_path)
+        self.store = store or ContentStore(get_cache_dir("test-results"), TEST_CACHE_MAX_BYTES)
+        self._parsed: dict[str, tuple[tuple[int, int], list, bool]] = {}
+        self._runner: str | None = None
+        self._has_npm_tests: bool | None = None
+        self._lock = threading.Lock()
+
+    def _parse(self, rel_path: str) -> tuple[list, bool]:
+        full_path = os.path.join(self.codebase_path, rel_path)
+        try:
+            stat = os.stat(full_path)
+        except OSError:
+            return [], False
+        signature = (stat.st_mtime_ns, stat.st_size)
+        cached = self._parsed.get(rel_path)
+        if cached and cached[0] == signature:
+            return cached[1], cached[2]
+        if rel_path.endswith(".py"):
+            imports, has_tests = _parse_python(full_path)
+        else:
+            imports, has_tests = _parse_js(full_path), bool(_JS_TEST_FILE.search(rel_path))
+        self._parsed[rel_path] = (signature, imports, has_tests)
+        return imports, has_tests
+
+    def _module_files(self, module: str, base: str, known: set[str]) -> list[str]:
+        """
+        Local files that importing module from directory base runs: the
+        module itself and the __init__.py of every package on the way.
+        """
+        files = []
+        parts = module.split(".")
+        for i in range(1, len(parts) + 1):
+            path = "/".join(p for p in [base, *parts[:i]] if p)
+            for candidate in (f"{path}/__init__.py", f"{path}.py"):
+                if candidate in known:
+                    files.append(candidate)
+        return files
+
+    def _js_module_file(self, specifier: str, directory: str, known: set[str]) -> str | None:
+        """
+        The local file a relative JavaScript or TypeScript import resolves to,
+        trying the extensions and index files and, for TypeScript importing
+        "./x.js", the x.ts source. Package imports aren't local and give None.
+        """
+        if not specifier.startswith("."):
+            return None
+        path = os.path.normpath(os.path.join(directory, specifier)).replace(os.sep, "/")
+        stem = os.path.splitext(path)[0] if path.endswith(JS_EXTENSIONS) else path
+        candidates = [path, *(path + ext for ext in JS_EXTENSIONS), *(f"{path}/index{ext}" for ext in JS_EXTENSIONS)]
+        candidates.extend(stem + ext for ext in JS_EXTENSIONS)
+        return next((candidate for candidate in candidates if candidate in known), None)
+
+    def _dependencies(self, rel_path: str, known: set[str], roots: list[str]) -> set[str]:
+        imports, _ = self._parse(rel_path)
+        if not rel_path.endswith(".py"):
+            directory = os.path.dirname(rel_path)
+            resolved = (self._js_module_file(specifier, directory, known) for specifier in imports)
+            return {path for path in resolved if path and path != rel_path}
+        directory = os.path.dirname(rel_path)
+        dependencies = set()
+        for level, module, names in imports:
+            if level:
+                base = directory
+                for _ in range(level - 1):
+                    base = os.path.dirname(base)
+                bases = [base]
+            else:
+                # Absolute imports resolve against the root, src/ and the importing file's directory
+                bases = [*roots, directory]
+            for base in bases:
+                if module:
+                    dependencies.update(self._module_files(module, base, known))
+                for name in names:
+                    dependencies.update(self._module_files(".".join(p for p in [module, name] if p), base, known))
+        dependencies.discard(rel_path)
+        return dependencies
+
+    def dependency_graph(self, files: list[str], extra: set[str] = frozenset()) -> dict[str, set[str]]:
+        """
+        Maps each Python, JavaScript and TypeScript file to the local files it
+        imports directly. Paths in extra (e.g. deleted files) count as
+        importable too.
+        """
+        source_files = [p for p in files if _is_source(p)]
+        known = set(source_files) | set(extra)
+        roots = [""] + (["src"] if any(p.startswith("src/") and p.endswith(".py") for p in source_files) else [])
+        return {p: self._dependencies(p, known, roots) for p in source_files}
+
+    def closure(self, rel_path: str, graph: dict[str, set[str]], files: set[str]) -> set[str]:
+        """
+        The test file, everything it imports transitively and the conftest.py
+        files of its directories with their imports.
+        """
+        pending = [rel_path]
+        directory = os.path.dirname(rel_path)
+        while rel_path.endswith(".py"):
+            conftest = f"{directory}/conftest.py" if directory else "conftest.py"
+            if conftest in files:
+                pending.append(conftest)
+            if not directory:
+                break
+            directory = os.path.dirname(directory)
+        seen = set()
+        while pending:
+            path = pending.pop()
+            if path not in seen:
+                seen.add(path)
+                pending.extend(graph.get(path, ()))
+        return seen
+
+    def runner(self, test_file: str = "") -> str:
+        """
+        "npm" for JavaScript and TypeScript tests. For Python tests "pytest"
+        when the codebase is configured for pytest and it's installed,
+        "unittest" otherwise.
+        """
+        if test_file.endswith(JS_EXTENSIONS):
+            return "npm"
+        with self._lock:
+            if self._runner is None:
+                self._runner = "unittest"
+                if self._uses_pytest():
+                    result = subprocess.run([TEST_PYTHON, "-c", "import pytest"], cwd=self.codebase_path, capture_output=True)
+                    if result.returncode == 0:
+                        self._runner = "pytest"
+            return self._runner
+
+    def has_npm_tests(self) -> bool:
+        """
+        True when the package.json at the codebase root has a test script.
+        """
+        with self._lock:
+            if self._has_npm_tests is None:
+                try:
+                    with open(os.path.join(self.codebase_path, "package.json"), encoding="utf-8") as f:
+                        self._has_npm_tests = bool(json.load(f).get("scripts", {}).get("test"))
+                except (OSError, ValueError, AttributeError):
+                    self._has_npm_tests = False
+            return self._has_npm_tests
+
+    def _uses_pytest(self) -> bool:
+        if any(os.path.isfile(os.path.join(self.codebase_path, name)) for name in ("pytest.ini", "conftest.py")):
+            return True
+        for name, marker in (("pyproject.toml", "[tool.pytest"), ("setup.cfg", "[tool:pytest]"), ("tox.ini", "[pytest]")):
+            try:
+                with open(os.path.join(self.codebase_path, name), encoding="utf-8", errors="replace") as f:
+                    if marker in f.read():
+                        return True
+            except OSError:
+                pass
+        return False
+
+    def changed_files(self) -> list[str]:
+        """
+        Files with uncommitted changes, including untracked and deleted ones.
+        """
+        try:
+            result = subprocess.run(
+                ["git", "-C", self.codebase_path, "status", "--porcelain", "-z", "--untracked-files=all"],
+                capture_output=True,
+                timeout=60
+            )
+        except (OSError, subprocess.SubprocessError):
+            return []
+        if result.returncode != 0:
+            return []
+        changed = []
+        entries = iter(result.stdout.decode("utf-8", errors="replace").split("\0"))
+        for entry in entries:
+            if len(entry) < 4:
+                continue
+            changed.append(entry[3:])
+            if entry[0] in "RC":
+                changed.append(next(entries, ""))  # The old path of a rename or copy
+        return [p for p in changed if p]
+
+    def data_files(self, test_file: str, files: list[str]) -> set[str]:
+        """
+        Non-source files in the test file's directory and below (fixtures,
+        data files, snapshots), which the test may read.
+        """
+        prefix = path_prefix(os.path.dirname(test_file))
+        return {p for p in files if p.startswith(prefix) and not _is_source(p)}
+
+    def _cache_key(self, test_file: str, dependencies: set[str], runner: str, hashes: dict[str, str | None]) -> str | None:
+        # Keyed by repository-relative paths, so that checkouts at other paths share results
+        key_hashes = []
+        for rel_path in sorted(dependencies) + [name for name in CONFIG_FILES if name not in dependencies]:
+            if rel_path not in hashes:
+                try:
+                    hashes[rel_path] = file_sha1(os.path.join(self.codebase_path, rel_path))
+                except FileNotFoundError:
+                    hashes[rel_path] = None
+                except OSError:
+                    return None
+            key_hashes.append((rel_path, hashes[rel_path]))
+        return cache_key("tests", test_file, runner, TEST_PYTHON, key_hashes)
+
+    def _command(self, test_file: str, runner: str) -> str:
+        if runner == "npm":
+            return f"npm test -- {shlex.quote(test_file)}"
+        if runner == "pytest":
+            return f"{shlex.quote(TEST_PYTHON)} -m pytest -q -rfE -p no:cacheprovider {shlex.quote(test_file)}"
+        module = test_file[:-3].replace("/", ".")
+        return f"{shlex.quote(TEST_PYTHON)} -m unittest -v {shlex.quote(module)}"
+
+    def run_file(self, test_file: str, runner: str) -> dict:
+        result = run_streaming_command(self._command(test_file, runner), cwd=self.codebase_path, timeout=TEST_FILE_TIMEOUT)
+        output = f"{result.stdout}\n{result.stderr}".strip()
+        if runner == "pytest":
+            counts = {}
+            for count, kind in _PYTEST_SUMMARY.findall(output.splitlines()[-1] if output else ""):
+                counts[kind.rstrip("s") if kind.startswith("error") else kind] = int(count)
+            failed = counts.get("failed", 0) + counts.get("error", 0)
+            tests = sum(counts.get(kind, 0) for kind in ("passed", "failed", "error", "skipped", "xfailed", "xpassed"))
+            failures = [" ".join(match.groups()) for match in map(_PYTEST_FAILURE.match, output.splitlines()) if match]
+        elif runner == "npm":
+            # Jest and Vitest print a "Tests:" summary line, node --test "# pass n"
+            # lines and Mocha "n passing" and "n failing"
+            summary = [line for line in output.splitlines() if line.strip().startswith("Tests")][-1:] or [output]
+            found = [(count, kind) for kind, count in _TAP_TEST_COUNTS.findall(output)] or _JS_TEST_COUNTS.findall(summary[0])
+            counts = {}
+            for count, kind in found:
+                kind = {"pass": "passed", "passing": "passed", "fail": "failed", "failing": "failed",
+                        "pending": "skipped", "todo": "skipped"}.get(kind, kind)
+                counts[kind] = counts.get(kind, 0) + int(count)
+            failed = counts.get("failed", 0)
+            tests = sum(counts.values())
+            failures = _JS_FAILURE.findall(output)
+        else:
+            ran = _UNITTEST_RAN.search(output)
+            tests = int(ran.group(1)) if ran else 0
+            counts = {kind: int(count) for kind, count in _UNITTEST_COUNTS.findall(output.splitlines()[-1] if output else "")}
+            failed = counts.get("failures", 0) + counts.get("errors", 0)
+            failures = [f"{kind} {name} ({location})" for kind, name, location in _UNITTEST_FAILURE.findall(output)]
+        # Exit code 5 of pytest and unittest means the file has no tests to run
+        passed = result.returncode in ((0,) if runner == "npm" else (0, 5)) and not result.stop_reason
+        if not passed and not failures:
+            failures = [result.stop_reason or f"exited with code {result.returncode}"]
+        return {
+            "passed": passed,
+            "tests": tests,
+            "failed": failed,
+            "failures": failures,
+            "tail": "" if passed else "\n".join(_failure_output(output).splitlines()[-FAILURE_TAIL_LINES:]),
+            "seconds": round(result.elapsed_seconds, 2),
+            "stopped": bool(result.stop_reason),
+        }
+
+    def run(
+        self,
+        changed_files: list[str] | None = None,
+        scope: str = "changed",
+        test_files: list[str] | None = None,
+        use_cache: bool = True,
+    ) -> dict:
+        """
+        Selects and runs the test files, returning the selection and the
+        result of each file, cached or not.
+        """
+        files = list_codebase_files(self.codebase_path)
+        file_set = set(files)
+        changed = {p.replace("\\", "/").removeprefix("./") for p in (changed_files if changed_files is not None else self.changed_files())}
+        graph = self.dependency_graph(files, extra=changed - file_set)
+        all_tests = [p for p in graph if p in file_set and os.path.basename(p) != "conftest.py" and (
+            _TEST_FILE_NAME.match(os.path.basename(p)) or self._parse(p)[1]
+        ) and (p.endswith(".py") or self.has_npm_tests())]
+        dependencies = {}
+        if test_files:
+            selected = [p.replace("\\", "/").removeprefix("./") for p in test_files]
+            missing = [p for p in selected if p not in file_set]
+            selected = [p for p in selected if p in file_set]
+        else:
+            missing = []
+            if scope == "all" or not changed:
+                selected = all_tests
+            else:
+                dependencies = {test: self.closure(test, graph, file_set) | self.data_files(test, files) for test in all_tests}
+                selected = [test for test in all_tests if dependencies[test] & changed]
+        for test_file in selected:
+            if test_file not in dependencies:
+                dependencies[test_file] = self.closure(test_file, graph, file_set) | self.data_files(test_file, files)
+        # Changed non-source files outside the selected tests' directories aren't
+        # part of any cache key, so cached results can't be trusted while they exist
+        covered = set().union(*(dependencies[test] for test in selected))
+        unmapped = sorted(p for p in changed if not _is_source(p) and p not in covered and p not in CONFIG_FILES)
+        read_cache = use_cache and not unmapped
+        runners = {test_file: self.runner(test_file) for test_file in selected}
+        results = {}
+        to_run = []
+        hashes = {}
+        for test_file in selected:
+            key = self._cache_key(test_file, dependencies[test_file], runners[test_file], hashes)
+            value = self.store.get(key) if key and read_cache else None
+            if value is not None:
+                results[test_file] = {**json.loads(value), "cached": True}
+            else:
+                to_run.append((test_file, key))
+
+        def run_file(item):
+            test_file, key = item
+            result = self.run_file(test_file, runners[test_file])
+            if key and not result["stopped"]:
+                self.store.put(key, json.dumps(result))
+            return test_file, {**result, "cached": False}
+
+        if to_run:
+            with ThreadPoolExecutor(max_workers=max(1, min(TEST_WORKERS, len(to_run)))) as pool:
+                results.update(pool.map(run_file, to_run))
+        return {
+            "runner": ", ".join(sorted(set(runners.values()))) or self.runner(),
+            "changed": sorted(changed),
+            "unmapped": unmapped,
+            "total_test_files": len(all_tests),
+            "selected": selected,
+            "missing": missing,
+            "results": {p: results[p] for p in selected},
+        }
+
+
+def run_tests(
+    runner: TestRunner,
+    changed_files: list[str] | None = None,
+    scope: str = "changed",
+    test_files: list[str] | None = None,
+    use_cache: bool = True,
+) -> str:
+    if scope not in ("changed", "all"):
+        return "Error: scope must be 'changed' or 'all'."
+    start = time.perf_counter()
+    try:
+        run = runner.run(changed_files, scope, test_files, use_cache)
+    except Exception as e:
+        return f"Exception while running tests: {e}"
+    results = run["results"]
+    if test_files:
+        selection = f"Ran {len(run['selected'])} requested test files"
+    elif scope == "all" or not run["changed"]:
+        selection = f"Ran all {len(run['selected'])} test files"
+    else:
+        selection = (f"Ran {len(run['selected'])} of {run['total_test_files']} test files, "
+                     f"affected by {len(run['changed'])} changed files")
+    failed = [p for p, r in results.items() if not r["passed"]]
+    cached = sum(1 for r in results.values() if r["cached"])
+    tests = sum(r["tests"] for r in results.values())
+    lines = [
+        f"{selection} ({run['runner']}, {tests} tests) in {time.perf_counter() - start:.1f}s: "
+        f"{len(results) - len(failed)} passed, {len(failed)} failed, {cached} results from cache."
+    ]
+    for rel_path, result in results.items():
+        status = "FAILED" if not result["passed"] else "passed"
+        detail = f"{result['failed']} of {result['tests']} tests failed" if not result["passed"] else f"{result['tests']} tests"
+        timing = " (cached)" if result["cached"] else f" in {result['seconds']}s"
+        lines.append(f"{rel_path}: {status}, {detail}{timing}")
+        if not result["passed"]:
+            lines.extend(f"  {failure}" for failure in result["failures"])
+            lines.extend(f"  | {line}" for line in result["tail"].splitlines())
+    if run["missing"]:
+        lines.append(f"Not found: {', '.join(run['missing'])}")
+    if run["unmapped"]:
+        lines.append(
+            f"{len(run['unmapped'])} changed non-source files can't be mapped to tests ({', '.join(run['unmapped'][:5])}"
+            f"{', ...' if len(run['unmapped']) > 5 else ''}), so no cached results were used"
+            f"{'; use scope all if tests read them.' if scope == 'changed' and not test_files else '.'}"
+        )
+    if not results and not run["missing"]:
+        lines.append("No affected test files found.")
+    output = "\n".join(lines)
+    if len(output) > MAX_OUTPUT_CHARS:
+        return output[:MAX_OUTPUT_CHARS] + "\n... output truncated, run the failing test files one by one with test_files."
+    return output
+
+
+class RunTestsTool(StructuredTool):
+    """
+    StructuredTool for running the tests affected by the agent's changes.
+    """
+
+    def __init__(self, codebase_path: str):
+        runner = TestRunner(codebase_path)
+        super().__init__(
+            func=lambda changed_files=None, scope="changed", test_files=None, use_cache=True: run_tests(
+                runner, changed_files, scope, test_files, use_cache
+            ),
+            name="run_tests",
+            description=(
+                "Run the Python, JavaScript and TypeScript tests affected by the changed files, found through the imports "
+                "of the codebase, in parallel. "
+                "Results of test files whose code and dependencies haven't changed are reused. "
+                "Returns a summary with the failing tests and the end of their output. "
+                "Use it instead of running the test suite through the shell."
+            ),
+            args_schema=RunTestsInput,
+        )
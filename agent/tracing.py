@@ -0,0 +1,219 @@
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.outputs import LLMResult
+
+# Used to group tool calls in the summary and metrics
+TOOL_CATEGORIES = {
+    "run_shell_command": "shell",
+    "run_tests": "test",
+    "add_azure_devops_work_item_comment": "azure_devops",
+    "create_azure_devops_pull_request": "azure_devops",
+    "copy_file": "file",
+    "file_delete": "file",
+    "file_search": "file",
+    "move_file": "file",
+    "read_file": "file",
+    "write_file": "file",
+    "list_directory": "file",
+    "codebase_index": "file",
+    "read_file_range": "file",
+    "edit_file": "file",
+    "search_code": "file",
+}
+# Tools report most failures in their output instead of raising
+_FAILURE_PREFIXES = ("Error", "Exception", "Failed", "Command stopped early", "Azure DevOps org")
+
+
+def tool_category(name: str) -> str:
+    return TOOL_CATEGORIES.get(name, "other")
+
+
+def _output_text(output) -> str:
+    content = getattr(output, "content", output)  # Tools may return a ToolMessage
+    return content if isinstance(content, str) else str(content)
+
+
+def _token_usage(response: LLMResult) -> dict:
+    """
+    Reads token usage from the generated message (streaming with stream_usage)
+    or from llm_output (non-streaming calls).
+    """
+    usage = {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0}
+    found = False
+    for generations in response.generations:
+        for generation in generations:
+            metadata = getattr(getattr(generation, "message", None), "usage_metadata", None)
+            if metadata:
+                found = True
+                usage["prompt_tokens"] += metadata.get("input_tokens", 0)
+                usage["completion_tokens"] += metadata.get("output_tokens", 0)
+                usage["total_tokens"] += metadata.get("total_tokens", 0)
+    if not found and response.llm_output:
+        token_usage = response.llm_output.get("token_usage") or {}
+        for key in usage:
+            usage[key] = token_usage.get(key, 0) or 0
+    return usage
+
+
+def _from_cache(response: LLMResult) -> bool:
+    """
+    True when the response was served by the response cache, see LLMResponseCache.
+    """
+    return any(
+        getattr(getattr(generation, "message", None), "response_metadata", {}).get("cache_hit", False)
+        for generations in response.generations
+        for generation in generations
+    )
+
+
+class RunTracer(BaseCallbackHandler):
+    """
+    Callback handler that records every LLM call (tokens, latency) and tool
+    call (duration, output size, success) of an agent run. Records are kept
+    in memory and, when trace_path is set, appended to it as JSONL.
+    """
+
+    def __init__(self, trace_path: str | None = None):
+        self.trace_path = trace_path
+        self.records: list[dict] = []
+        self._pending: dict[UUID, dict] = {}
+        self._lock = threading.Lock()
+        self._trace_file = None
+        if trace_path:
+            os.makedirs(os.path.dirname(os.path.abspath(trace_path)), exist_ok=True)
+            self._trace_file = open(trace_path, "a", encoding="utf-8")
+
+    def _start(self, run_id: UUID, record: dict):
+        record["start"] = time.time()
+        record["_perf_start"] = time.perf_counter()
+        with self._lock:
+            self._pending[run_id] = record
+
+    def _finish(self, run_id: UUID, **fields):
+        with self._lock:
+            record = self._pending.pop(run_id, None)
+            if record is None:
+                return
+            record["duration_seconds"] = round(time.perf_counter() - record.pop("_perf_start"), 4)
+            record.update(fields)
+            self.records.append(record)
+            if self._trace_file:
+                self._trace_file.write(json.dumps(record, default=str) + "\n")
+                self._trace_file.flush()
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs):
+        invocation = kwargs.get("invocation_params") or {}
+        model = invocation.get("model") or invocation.get("azure_deployment") or invocation.get("model_name")
+        self._start(run_id, {"type": "llm", "model": model, "messages": sum(len(m) for m in messages)})
+
+    def on_llm_start(self, serialized, prompts, *, run_id, **kwargs):
+        self._start(run_id, {"type": "llm", "model": (kwargs.get("invocation_params") or {}).get("model")})
+
+    def on_llm_end(self, response: LLMResult, *, run_id, **kwargs):
+        self._finish(run_id, success=True, cached=_from_cache(response), **_token_usage(response))
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        self._finish(run_id, success=False, error=str(error)[:500], prompt_tokens=0, completion_tokens=0, total_tokens=0)
+
+    def on_tool_start(self, serialized, input_str, *, run_id, **kwargs):
+        name = (serialized or {}).get("name") or kwargs.get("name") or "unknown"
+        self._start(run_id, {"type": "tool", "name": name, "category": tool_category(name), "input_chars": len(input_str or "")})
+
+    def on_tool_end(self, output, *, run_id, **kwargs):
+        text = _output_text(output)
+        self._finish(run_id, success=not text.startswith(_FAILURE_PREFIXES), output_chars=len(text))
+
+    def on_tool_error(self, error, *, run_id, **kwargs):
+        self._finish(run_id, success=False, error=str(error)[:500], output_chars=0)
+
+    def close(self):
+        if self._trace_file:
+            self._trace_file.close()
+            self._trace_file = None
+
+    def totals(self) -> dict:
+        llm = [r for r in self.records if r["type"] == "llm"]
+        tools = [r for r in self.records if r["type"] == "tool"]
+        return {
+            "llm_calls": len(llm),
+            "llm_cache_hits": sum(1 for r in llm if r.get("cached")),
+            "llm_seconds": sum(r["duration_seconds"] for r in llm),
+            "prompt_tokens": sum(r.get("prompt_tokens", 0) for r in llm),
+            "completion_tokens": sum(r.get("completion_tokens", 0) for r in llm),
+            "total_tokens": sum(r.get("total_tokens", 0) for r in llm),
+            "tool_calls": len(tools),
+            "tool_seconds": sum(r["duration_seconds"] for r in tools),
+            "tool_failures": sum(1 for r in tools if not r["success"]),
+        }
+
+    def tool_summary(self) -> dict[str, dict]:
+        summary = defaultdict(lambda: {"calls": 0, "failures": 0, "seconds": 0.0, "max_seconds": 0.0, "output_chars": 0})
+        for record in self.records:
+            if record["type"] != "tool":
+                continue
+            entry = summary[record["name"]]
+            entry["category"] = record["category"]
+            entry["calls"] += 1
+            entry["failures"] += 0 if record["success"] else 1
+            entry["seconds"] += record["duration_seconds"]
+            entry["max_seconds"] = max(entry["max_seconds"], record["duration_seconds"])
+            entry["output_chars"] += record.get("output_chars", 0)
+        return dict(summary)
+
+    def print_summary(self):
+        totals = self.totals()
+        print(f"LLM calls             : {totals['llm_calls']} ({totals['llm_seconds']:.1f}s, {totals['llm_cache_hits']} from cache)")
+        print(f"Prompt tokens used    : {totals['prompt_tokens']}")
+        print(f"Completion tokens used: {totals['completion_tokens']}")
+        print(f"Total tokens used     : {totals['total_tokens']}")
+        print(f"Tool calls            : {totals['tool_calls']} ({totals['tool_seconds']:.1f}s, {totals['tool_failures']} failed)")
+        summary = self.tool_summary()
+        if summary:
+            print(f"  {'tool':<36} {'category':<13} {'calls':>5} {'failed':>6} {'total s':>8} {'max s':>7} {'output':>9}")
+            for name, entry in sorted(summary.items(), key=lambda item: item[1]["seconds"], reverse=True):
+                print(f"  {name:<36} {entry['category']:<13} {entry['calls']:>5} {entry['failures']:>6} "
+                      f"{entry['seconds']:>8.2f} {entry['max_seconds']:>7.2f} {entry['output_chars']:>9}")
+
+    def to_openmetrics(self) -> str:
+        """
+        Renders the run's counters in the OpenMetrics text format.
+        """
+        totals = self.totals()
+        lines = [
+            "# TYPE ai_developer_llm_calls counter",
+            f"ai_developer_llm_calls_total {totals['llm_calls']}",
+            "# TYPE ai_developer_llm_cache_hits counter",
+            f"ai_developer_llm_cache_hits_total {totals['llm_cache_hits']}",
+            "# TYPE ai_developer_llm_tokens counter",
+            f'ai_developer_llm_tokens_total{{kind="prompt"}} {totals["prompt_tokens"]}',
+            f'ai_developer_llm_tokens_total{{kind="completion"}} {totals["completion_tokens"]}',
+            "# TYPE ai_developer_llm_latency_seconds summary",
+            f"ai_developer_llm_latency_seconds_sum {totals['llm_seconds']:.4f}",
+            f"ai_developer_llm_latency_seconds_count {totals['llm_calls']}",
+        ]
+        summary = self.tool_summary()
+        lines.append("# TYPE ai_developer_tool_calls counter")
+        for name, entry in sorted(summary.items()):
+            labels = f'tool="{name}",category="{entry["category"]}"'
+            lines.append(f'ai_developer_tool_calls_total{{{labels},success="true"}} {entry["calls"] - entry["failures"]}')
+            lines.append(f'ai_developer_tool_calls_total{{{labels},success="false"}} {entry["failures"]}')
+        lines.append("# TYPE ai_developer_tool_duration_seconds summary")
+        for name, entry in sorted(summary.items()):
+            lines.append(f'ai_developer_tool_duration_seconds_sum{{tool="{name}"}} {entry["seconds"]:.4f}')
+            lines.append(f'ai_developer_tool_duration_seconds_count{{tool="{name}"}} {entry["calls"]}')
+        lines.append("# TYPE ai_developer_tool_output_chars counter")
+        for name, entry in sorted(summary.items()):
+            lines.append(f'ai_developer_tool_output_chars_total{{tool="{name}"}} {entry["output_chars"]}')
+        lines.append("# EOF")
+        return "\n".join(lines) + "\n"
+
+    def write_openmetrics(self, path: str):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(self.to_openmetrics())
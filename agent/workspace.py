@@ -0,0 +1,332 @@
+import hashlib
+import json
+import os
+import re
+import shutil
+import threading
+import time
+from collections import Counter, defaultdict
+
+from agent.cache_dir import get_cache_dir
+from agent.worktree import _git, create_worktree, remove_worktree
+
+DEFAULT_DISK_BUDGET_GB = 20.0
+MIRROR_FETCH_INTERVAL = 60  # Seconds, concurrent work items share one fetch
+# Remote branches go to refs/remotes/origin/ so that a pruning fetch never
+# touches the local branches the agents create in their worktrees
+MIRROR_FETCH_REFSPEC = "+refs/heads/*:refs/remotes/origin/*"
+# Dependency directories that can be copied between checkouts, with the
+# lockfile that pins their content. Virtualenvs aren't listed because their
+# scripts hard-code the absolute path they were created at.
+DEPENDENCY_DIRS = [
+    ("package-lock.json", "node_modules"),
+    ("npm-shrinkwrap.json", "node_modules"),
+    ("yarn.lock", "node_modules"),
+    ("pnpm-lock.yaml", "node_modules"),
+    ("composer.lock", "vendor"),
+    ("Gemfile.lock", "vendor/bundle"),
+]
+# Download caches of the package managers, shared by every checkout so that
+# installs which can't be restored from DEPENDENCY_DIRS skip the downloads
+PACKAGE_CACHE_ENV = {
+    "PIP_CACHE_DIR": "pip",
+    "UV_CACHE_DIR": "uv",
+    "npm_config_cache": "npm",
+    "YARN_CACHE_FOLDER": "yarn",
+}
+_REMOTE_PATTERN = re.compile(r"^(https?|ssh|git|file)://|^[\w.-]+@[\w.-]+:")
+
+
+def is_remote(codebase: str) -> bool:
+    """
+    True when codebase is a git URL rather than a local directory.
+    """
+    return bool(_REMOTE_PATTERN.match(codebase)) and not os.path.exists(codebase)
+
+
+def _slug(repo_url: str) -> str:
+    name = repo_url.rstrip("/").rsplit("/", 1)[-1].rsplit(":", 1)[-1].removesuffix(".git")
+    name = re.sub(r"[^\w.-]+", "-", name)[:40] or "repo"
+    return f"{name}-{hashlib.sha1(repo_url.encode()).hexdigest()[:10]}"
+
+
+def directory_size(path: str) -> int:
+    total = 0
+    pending = [path]
+    while pending:
+        try:
+            entries = list(os.scandir(pending.pop()))
+        except OSError:
+            continue
+        for entry in entries:
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    pending.append(entry.path)
+                else:
+                    total += entry.stat(follow_symlinks=False).st_size
+            except OSError:
+                pass
+    return total
+
+
+class WorkspaceManager:
+    """
+    Keeps what a run needs before the agent can start warm between runs:
+    a bare mirror of each remote repository, from which every work item gets
+    a cheap git worktree, and the dependency directories of earlier checkouts,
+    keyed by a hash of their lockfile.
+
+    Mirrors and dependency directories are evicted least recently used first
+    once together they exceed disk_budget_bytes. Entries used by a running
+    work item are never evicted.
+    """
+
+    def __init__(self, root: str | None = None, disk_budget_bytes: int | None = None):
+        self.root = root or get_cache_dir("workspaces")
+        if disk_budget_bytes is None:
+            budget_gb = float(os.environ.get("AI_DEVELOPER_WORKSPACE_BUDGET_GB", DEFAULT_DISK_BUDGET_GB))
+            disk_budget_bytes = int(budget_gb * 1024 ** 3)
+        self.disk_budget_bytes = disk_budget_bytes
+        self.index_path = os.path.join(self.root, "index.json")
+        self._lock = threading.Lock()
+        self._key_locks: dict[str, threading.Lock] = defaultdict(threading.Lock)
+        self._in_use: Counter = Counter()
+        self._workspaces: dict[str, tuple[str, str | None]] = {}
+
+    def _load_index(self) -> dict[str, dict]:
+        try:
+            with open(self.index_path, encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save_index(self, index: dict[str, dict]):
+        tmp_path = f"{self.index_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(index, f, indent=1, sort_keys=True)
+        os.replace(tmp_path, self.index_path)
+
+    def _touch(self, key: str, size: int | None = None, **fields) -> dict:
+        # Keys are paths relative to root, e.g. "mirrors/app-1a2b3c4d5e.git"
+        with self._lock:
+            index = self._load_index()
+            entry = index.setdefault(key, {"size": 0})
+            entry["last_used"] = time.time()
+            if size is not None:
+                entry["size"] = size
+            entry.update(fields)
+            self._save_index(index)
+            return entry
+
+    def _key_lock(self, key: str) -> threading.Lock:
+        with self._lock:
+            return self._key_locks[key]
+
+    def package_cache_env(self) -> dict[str, str]:
+        """
+        Environment variables that point the package managers' download
+        caches into the workspace cache. They aren't counted in the budget.
+        """
+        return {name: os.path.join(self.root, "package-caches", directory) for name, directory in PACKAGE_CACHE_ENV.items()}
+
+    def mirror(self, repo_url: str) -> str:
+        """
+        Returns the path of the local bare mirror of repo_url, cloning it on
+        first use and fetching new commits at most every MIRROR_FETCH_INTERVAL.
+        """
+        key = f"mirrors/{_slug(repo_url)}.git"
+        path = os.path.join(self.root, key)
+        with self._key_lock(key):
+            entry = self._load_index().get(key, {})
+            if os.path.isdir(path):
+                if time.time() - entry.get("fetched", 0) < MIRROR_FETCH_INTERVAL:
+                    self._touch(key)
+                    return path
+                print(f"Fetching {repo_url} into the workspace cache")
+                if _git(path, "config", "remote.origin.fetch") != MIRROR_FETCH_REFSPEC:
+                    # Mirrors cloned by older versions fetched straight into refs/heads/
+                    _git(path, "config", "remote.origin.fetch", MIRROR_FETCH_REFSPEC)
+                    _git(path, "fetch", "--prune", "origin")
+                    _git(path, "remote", "set-head", "origin", "--auto")
+                else:
+                    _git(path, "fetch", "--prune", "origin")
+            else:
+                print(f"Mirroring {repo_url} into the workspace cache")
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                tmp_path = f"{path}.{os.getpid()}.tmp"
+                shutil.rmtree(tmp_path, ignore_errors=True)
+                _git(os.path.dirname(path), "clone", "--bare", "--quiet", repo_url, tmp_path)
+                # A bare clone has no fetch refspec and copies the remote branches into
+                # refs/heads/; track them under refs/remotes/origin/ instead
+                _git(tmp_path, "config", "remote.origin.fetch", MIRROR_FETCH_REFSPEC)
+                _git(tmp_path, "fetch", "--quiet", "origin")
+                _git(tmp_path, "remote", "set-head", "origin", "--auto")
+                for ref in _git(tmp_path, "for-each-ref", "--format=%(refname)", "refs/heads/").splitlines():
+                    _git(tmp_path, "update-ref", "-d", ref)
+                os.replace(tmp_path, path)
+            self._touch(key, directory_size(path), fetched=time.time())
+        return path
+
+    def create_workspace(self, codebase: str, name: str, ref: str | None = None) -> str:
+        """
+        Creates a git worktree for one work item, from the mirror's copy of
+        the remote default branch when codebase is a git URL or from the local
+        repository otherwise, and restores its cached dependency directories.
+        Returns its path.
+        """
+        if is_remote(codebase):
+            repository = self.mirror(codebase)
+            key = os.path.relpath(repository, self.root)
+            path = os.path.join(self.root, "worktrees", f"{_slug(codebase)}-{name}")
+            ref = ref or "origin/HEAD"
+        else:
+            repository, key, path = codebase, None, None
+        with self._lock:
+            if key:
+                self._in_use[key] += 1
+        try:
+            path = create_worktree(repository, name, ref or "HEAD", path=path)
+        except Exception:
+            self._release(key)
+            raise
+        with self._lock:
+            self._workspaces[path] = (repository, key)
+        try:
+            self.restore_dependencies(path)
+        except Exception as e:
+            # The agent installs the dependencies itself when they can't be restored
+            print(f"Failed to restore the dependencies of {path} from the workspace cache: {e}")
+        return path
+
+    def release_workspace(self, path: str):
+        """
+        Saves the workspace's dependency directories, removes its worktree
+        and evicts old entries if the cache is over budget.
+        """
+        with self._lock:
+            repository, key = self._workspaces.pop(path)
+        try:
+            try:
+                self.save_dependencies(path)
+            except Exception as e:
+                # The worktree is removed anyway, the next checkout just installs its dependencies
+                print(f"Failed to save the dependencies of {path} to the workspace cache: {e}")
+            remove_worktree(repository, path)
+        finally:
+            self._release(key)
+            self.evict()
+
+    def _release(self, key: str | None):
+        if key:
+            with self._lock:
+                self._in_use[key] -= 1
+
+    def _dependency_keys(self, path: str) -> list[tuple[str, str]]:
+        keys = []
+        seen = set()
+        for lockfile, directory in DEPENDENCY_DIRS:
+            lockfile_path = os.path.join(path, lockfile)
+            if directory in seen or not os.path.isfile(lockfile_path):
+                continue
+            seen.add(directory)
+            digest = hashlib.sha256(lockfile.encode())
+            with open(lockfile_path, "rb") as f:
+                for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                    digest.update(chunk)
+            keys.append((directory, f"dependencies/{directory.replace('/', '_')}-{digest.hexdigest()[:20]}"))
+        return keys
+
+    def restore_dependencies(self, path: str) -> list[str]:
+        """
+        Copies cached dependency directories whose lockfile matches into path,
+        skipping directories that already exist. Returns the restored ones.
+        """
+        restored = []
+        for directory, key in self._dependency_keys(path):
+            target = os.path.join(path, directory)
+            entry_path = os.path.join(self.root, key)
+            if os.path.exists(target) or not os.path.isdir(entry_path):
+                continue
+            with self._lock:
+                self._in_use[key] += 1
+            # Copy next to the target first so a failed copy never leaves a partial directory
+            tmp_path = f"{target}.{os.getpid()}.tmp"
+            try:
+                start = time.perf_counter()
+                try:
+                    shutil.copytree(entry_path, tmp_path, symlinks=True)
+                    os.replace(tmp_path, target)
+                finally:
+                    shutil.rmtree(tmp_path, ignore_errors=True)
+                self._touch(key)
+                print(f"Restored {directory} from the workspace cache in {time.perf_counter() - start:.1f}s")
+                restored.append(directory)
+            finally:
+                self._release(key)
+        return restored
+
+    def save_dependencies(self, path: str) -> list[str]:
+        """
+        Copies dependency directories of path into the cache unless an entry
+        for the same lockfile exists. Returns the saved ones.
+        """
+        saved = []
+        for directory, key in self._dependency_keys(path):
+            source = os.path.join(path, directory)
+            entry_path = os.path.join(self.root, key)
+            if not os.path.isdir(source):
+                continue
+            with self._key_lock(key):
+                if os.path.isdir(entry_path):
+                    self._touch(key)
+                    continue
+                os.makedirs(os.path.dirname(entry_path), exist_ok=True)
+                tmp_path = f"{entry_path}.{os.getpid()}.tmp"
+                shutil.rmtree(tmp_path, ignore_errors=True)
+                shutil.copytree(source, tmp_path, symlinks=True)
+                os.replace(tmp_path, entry_path)
+                self._touch(key, directory_size(entry_path))
+                saved.append(directory)
+        return saved
+
+    def evict(self) -> list[str]:
+        """
+        Deletes least recently used entries until the cache fits the budget.
+        Returns the evicted keys.
+        """
+        evicted = []
+        with self._lock:
+            index = self._load_index()
+            total = sum(entry.get("size", 0) for entry in index.values())
+            for key, entry in sorted(index.items(), key=lambda item: item[1].get("last_used", 0)):
+                if total <= self.disk_budget_bytes:
+                    break
+                if self._in_use[key]:
+                    continue
+                shutil.rmtree(os.path.join(self.root, key), ignore_errors=True)
+                total -= entry.get("size", 0)
+                del index[key]
+                evicted.append(key)
+            if evicted:
+                self._save_index(index)
+        for key in evicted:
+            print(f"Evicted {key} from the workspace cache")
+        return evicted
+
+    def usage(self) -> dict[str, dict]:
+        return self._load_index()
+
+
+_manager: WorkspaceManager | None = None
+_manager_lock = threading.Lock()
+
+
+def get_workspace_manager() -> WorkspaceManager:
+    """
+    Returns the process-wide manager so concurrent work items share its locks.
+    """
+    global _manager
+    with _manager_lock:
+        if _manager is None:
+            _manager = WorkspaceManager()
+        return _manager
@@ -0,0 +1,47 @@
+import os
+import subprocess
+import threading
+
+WORKTREE_DIR_NAME = ".ai-developer-worktrees"
+
+# git locks its worktree metadata, so add/remove one worktree at a time
+_git_lock = threading.Lock()
+
+
+def _git(repo_path: str, *args: str) -> str:
+    result = subprocess.run(
+        ["git", "-C", repo_path, *args],
+        capture_output=True,
+        text=True,
+        timeout=300
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"git {' '.join(args)} failed: {result.stderr.strip()}")
+    return result.stdout.strip()
+
+
+def worktree_path_for(codebase_path: str, name: str) -> str:
+    # Worktrees live next to the codebase so they aren't picked up by the agent's file tools
+    codebase_path = os.path.abspath(codebase_path)
+    parent = os.path.dirname(codebase_path)
+    return os.path.join(parent, WORKTREE_DIR_NAME, f"{os.path.basename(codebase_path)}-{name}")
+
+
+def create_worktree(codebase_path: str, name: str, ref: str = "HEAD", path: str | None = None) -> str:
+    """
+    Creates a detached git worktree of codebase_path at ref and returns its absolute path.
+    A stale worktree with the same name is removed first.
+    """
+    path = os.path.abspath(path) if path else worktree_path_for(codebase_path, name)
+    with _git_lock:
+        if os.path.exists(path):
+            _git(codebase_path, "worktree", "remove", "--force", path)
+        _git(codebase_path, "worktree", "prune")
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        _git(codebase_path, "worktree", "add", "--detach", path, ref)
+    return path
+
+
+def remove_worktree(codebase_path: str, path: str):
+    with _git_lock:
+        _git(codebase_path, "worktree", "remove", "--force", path)
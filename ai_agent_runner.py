@@ -1,8 +1,10 @@
+import json
 import os
 import sys
-import requests
+import time
 
-from agent.developer import DeveloperAgent
+# The agent stack (langchain, openai, pydantic) and requests are imported inside
+# the functions that need them, so that "no work" runs and --help return quickly
 
 # Configuration (set these as environment variables in your pipeline)
 AZURE_DEVOPS_ORG = os.environ.get("AZURE_DEVOPS_ORG")
@@ -12,8 +14,9 @@ AI_DEVELOPER_TAG = "AI Developer"  # Tag used to identify work items for the age
 
 
 def get_work_item_details(work_item_id):
-    url = f"https://dev.azure.com/{AZURE_DEVOPS_ORG}/{AZURE_DEVOPS_PROJECT}/_apis/wit/workitems/{work_item_id}?api-version=7.0"
-    response = requests.get(
+    from agent.azure_devops_client import azure_devops_base_url, get_client
+    url = f"{azure_devops_base_url()}/{AZURE_DEVOPS_ORG}/{AZURE_DEVOPS_PROJECT}/_apis/wit/workitems/{work_item_id}?api-version=7.0"
+    response = get_client().get(
         url,
         auth=("", AZURE_DEVOPS_PAT)
     )
@@ -22,9 +25,10 @@ def get_work_item_details(work_item_id):
 
 
 def add_comment_to_work_item(work_item_id, comment):
-    url = f"https://dev.azure.com/{AZURE_DEVOPS_ORG}/{AZURE_DEVOPS_PROJECT}/_apis/wit/workItems/{work_item_id}/comments?api-version=7.0-preview.3"
+    from agent.azure_devops_client import azure_devops_base_url, get_client
+    url = f"{azure_devops_base_url()}/{AZURE_DEVOPS_ORG}/{AZURE_DEVOPS_PROJECT}/_apis/wit/workItems/{work_item_id}/comments?api-version=7.0-preview.3"
     data = {"text": comment}
-    response = requests.post(
+    response = get_client().post(
         url,
         json=data,
         auth=("", AZURE_DEVOPS_PAT)
@@ -33,7 +37,8 @@ def add_comment_to_work_item(work_item_id, comment):
     return response.json()
 
 
-def implement_task_logic(work_item, codebase_path='codebase'):
+def implement_task_logic(work_item, codebase_path='codebase', shell_cwd=None):
+    from agent.developer import DeveloperAgent
     # Placeholder: Implement your AI logic here
     # For now, just print the work item title and ID
     print(f"Implementing work item {work_item['id']}: {work_item['fields'].get('System.Title')}")
@@ -51,12 +56,18 @@ def implement_task_logic(work_item, codebase_path='codebase'):
     azure_devops_project = os.environ.get("AZURE_DEVOPS_PROJECT")
     azure_devops_repo_id = os.environ.get("AZURE_DEVOPS_REPO_ID")
     azure_devops_pat = os.environ.get("AZURE_DEVOPS_PAT")
+    # Per-run LLM and tool traces, see agent/tracing.py
+    trace_dir = os.environ.get("AI_DEVELOPER_TRACE_DIR")
+    metrics_dir = os.environ.get("AI_DEVELOPER_METRICS_DIR")
     agent = DeveloperAgent(
         codebase_path=codebase_path,
         azure_devops_org=azure_devops_org,
         azure_devops_project=azure_devops_project,
         azure_devops_repo_id=azure_devops_repo_id,
-        azure_devops_pat=azure_devops_pat
+        azure_devops_pat=azure_devops_pat,
+        shell_cwd=shell_cwd,
+        trace_path=os.path.join(trace_dir, f"work-item-{work_item['id']}.jsonl") if trace_dir else None,
+        metrics_path=os.path.join(metrics_dir, f"work-item-{work_item['id']}.prom") if metrics_dir else None
     )
     feature_name = work_item['fields'].get('System.Title', 'Unnamed Feature')
     specification = f"""
@@ -79,23 +90,155 @@ def implement_task_logic(work_item, codebase_path='codebase'):
     """
     response = agent.develop_feature(specification)
     #print(f"Agent response: {response}")
-    pass
+    return response
+
+def load_work_item_queue(path):
+    """
+    Reads the JSONL queue written by check_for_tasks.py, one work item per line.
+    """
+    work_items = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                work_items.append(json.loads(line))
+    return work_items
+
+
+def run_work_item_in_worktree(work_item, codebase_path='codebase'):
+    """
+    Runs the agent on a private git worktree of the codebase so that
+    concurrent agents don't see each other's uncommitted changes. The
+    worktree comes from the workspace cache (agent/workspace.py), which
+    also restores the dependency directories of earlier runs.
+    """
+    from agent.workspace import get_workspace_manager
+    manager = get_workspace_manager()
+    worktree_path = manager.create_workspace(codebase_path, f"wi-{work_item['id']}")
+    try:
+        return implement_task_logic(work_item, codebase_path=worktree_path, shell_cwd=worktree_path)
+    finally:
+        try:
+            manager.release_workspace(worktree_path)
+        except Exception as e:
+            print(f"Failed to remove worktree {worktree_path}: {e}")
+
+
+def run_work_item(work_item, codebase_path='codebase', isolated=False):
+    """
+    Runs the agent on one work item and returns a result record with its
+    status and duration instead of raising. A codebase given as a git URL
+    always runs on a worktree of its cached mirror.
+
+    Items claimed by check_for_tasks.py get their lease renewed first (and are
+    skipped if the claim was lost) and are released when the run ends.
+    """
+    from agent.workspace import get_workspace_manager, is_remote
+    start = time.perf_counter()
+    claimed = "claim" in work_item
+    if claimed:
+        from check_for_tasks import renew_claim
+        try:
+            if not renew_claim(work_item):
+                return {"status": "skipped", "seconds": time.perf_counter() - start, "error": "claim lost to another runner"}
+        except Exception as e:
+            print(f"Work item {work_item['id']} failed: could not renew its claim: {e}")
+            return {"status": "failed", "seconds": time.perf_counter() - start, "error": str(e)}
+    try:
+        if isolated or is_remote(codebase_path):
+            output = run_work_item_in_worktree(work_item, codebase_path=codebase_path)
+        else:
+            manager = get_workspace_manager()
+            # The dependency cache is only an optimization, failing to use or fill it doesn't fail the item
+            try:
+                manager.restore_dependencies(codebase_path)
+            except Exception as e:
+                print(f"Failed to restore the dependencies of work item {work_item['id']} from the workspace cache: {e}")
+            output = implement_task_logic(work_item, codebase_path=codebase_path)
+            try:
+                manager.save_dependencies(codebase_path)
+            except Exception as e:
+                print(f"Failed to save the dependencies of work item {work_item['id']} to the workspace cache: {e}")
+        result = {"status": "succeeded", "seconds": time.perf_counter() - start, "output": output}
+    except Exception as e:
+        print(f"Work item {work_item['id']} failed: {e}")
+        result = {"status": "failed", "seconds": time.perf_counter() - start, "error": str(e)}
+    if claimed:
+        from check_for_tasks import complete_claim
+        try:
+            complete_claim(work_item, result["status"] == "succeeded", result.get("error"))
+        except Exception as e:
+            # The item stays claimed and is picked up again once its lease expires
+            print(f"Failed to release the claim of work item {work_item['id']}: {e}")
+    return result
+
+
+def process_work_items(work_items, codebase_path='codebase', workers=1):
+    """
+    Runs the agent on each work item. With workers > 1 the items run
+    concurrently, each on its own git worktree. A failing item doesn't stop
+    the rest of the batch; failures are returned as {work_item_id: error}.
+    """
+    results = {}
+
+    def run(work_item):
+        results[work_item["id"]] = run_work_item(work_item, codebase_path=codebase_path, isolated=workers > 1)
+
+    if workers > 1:
+        from concurrent.futures import ThreadPoolExecutor
+        print(f"Processing {len(work_items)} work items with {workers} workers")
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            list(executor.map(run, work_items))
+    else:
+        for index, work_item in enumerate(work_items, start=1):
+            print(f"Processing work item {work_item['id']} ({index}/{len(work_items)})")
+            run(work_item)
+
+    print("Work item results:")
+    for work_item in work_items:
+        result = results[work_item["id"]]
+        print(f"  {work_item['id']}: {result['status']} in {result['seconds']:.1f}s"
+              + (f" ({result['error']})" if "error" in result else ""))
+    return {work_item_id: result["error"] for work_item_id, result in results.items() if result["status"] == "failed"}
+
 
 def main():
     import argparse
     parser = argparse.ArgumentParser(description="Run the AI Developer Agent on a work item.")
-    parser.add_argument("work_item_id", help="Azure DevOps work item ID")
-    parser.add_argument("--codebase-path", default="codebase", help="Path to the codebase directory (default: codebase)")
+    parser.add_argument("work_item_id", nargs="?", default="0", help="Azure DevOps work item ID")
+    parser.add_argument("--queue-file", help="Process every work item in this JSONL queue written by check_for_tasks.py")
+    parser.add_argument("--codebase-path", default="codebase", help="Path to the codebase directory, or a git URL to check out from the workspace cache (default: codebase)")
+    parser.add_argument("--workers", type=int, default=1, help="Number of work items to process concurrently, each on its own git worktree (default: 1)")
+    parser.add_argument("--trace-dir", help="Write JSONL traces of every LLM and tool call here, one file per work item (or set AI_DEVELOPER_TRACE_DIR)")
+    parser.add_argument("--metrics-dir", help="Write an OpenMetrics dump of each work item's run here (or set AI_DEVELOPER_METRICS_DIR)")
     args = parser.parse_args()
+    if args.trace_dir:
+        os.environ["AI_DEVELOPER_TRACE_DIR"] = args.trace_dir
+    if args.metrics_dir:
+        os.environ["AI_DEVELOPER_METRICS_DIR"] = args.metrics_dir
 
     work_item_id = args.work_item_id
     codebase_path = args.codebase_path
 
-    if work_item_id == "0":
+    if args.queue_file:
+        work_items = load_work_item_queue(args.queue_file)
+    elif work_item_id != "0":
+        work_items = [get_work_item_details(work_item_id)]
+    else:
+        work_items = []
+    if not work_items:
         print("No work item to process.")
         sys.exit(0)
-    work_item = get_work_item_details(work_item_id)
-    implement_task_logic(work_item, codebase_path=codebase_path)
+    from agent.workspace import get_workspace_manager
+    # Installs the agent runs through the shell tool reuse the shared download caches
+    for name, value in get_workspace_manager().package_cache_env().items():
+        os.environ.setdefault(name, value)
+    failures = process_work_items(work_items, codebase_path=codebase_path, workers=max(1, args.workers))
+    from agent.azure_devops_client import get_client
+    get_client().print_metrics()
+    if failures:
+        print(f"{len(failures)} of {len(work_items)} work items failed: {', '.join(str(i) for i in failures)}")
+        sys.exit(1)
 
 
 if __name__ == "__main__":
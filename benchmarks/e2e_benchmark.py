@@ -0,0 +1,199 @@
+"""
+Offline end-to-end benchmark.
+
+Runs check_for_tasks.main and ai_agent_runner.main against a local fake Azure
+DevOps server (benchmarks/fake_azure_devops.py) with a scripted chat model
+(benchmarks/scripted_llm.py) on a copy of a sample codebase, and reports wall
+time, HTTP calls, LLM and tool latencies and memory. Needs no network access.
+
+    python benchmarks/e2e_benchmark.py --work-items 4 --workers 2 --llm-latency 0.2
+"""
+import contextlib
+import io
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections import defaultdict
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SAMPLE_CODEBASES = os.path.join(REPO_ROOT, "benchmarks", "sample_codebases")
+sys.path.insert(0, REPO_ROOT)
+
+from benchmarks.fake_azure_devops import FakeAzureDevOps  # noqa: E402
+
+GIT_IDENTITY = {
+    "GIT_AUTHOR_NAME": "AI Developer Benchmark",
+    "GIT_AUTHOR_EMAIL": "benchmark@example.com",
+    "GIT_COMMITTER_NAME": "AI Developer Benchmark",
+    "GIT_COMMITTER_EMAIL": "benchmark@example.com",
+}
+
+
+def prepare_codebase(sample: str, workspace: str) -> str:
+    codebase_path = os.path.join(workspace, sample)
+    shutil.copytree(os.path.join(SAMPLE_CODEBASES, sample), codebase_path)
+    for command in (["git", "init", "-q", "-b", "main"], ["git", "add", "-A"], ["git", "commit", "-q", "-m", "Initial commit"]):
+        subprocess.run(command, cwd=codebase_path, check=True, capture_output=True)
+    return codebase_path
+
+
+def run_main(main, argv) -> int:
+    saved_argv = sys.argv
+    sys.argv = argv
+    try:
+        main()
+        return 0
+    except SystemExit as e:
+        return e.code if isinstance(e.code, int) else 0
+    finally:
+        sys.argv = saved_argv
+
+
+def read_traces(trace_dir: str) -> list[dict]:
+    records = []
+    if not os.path.isdir(trace_dir):
+        return records
+    for name in sorted(os.listdir(trace_dir)):
+        if name.endswith(".jsonl"):
+            with open(os.path.join(trace_dir, name), encoding="utf-8") as f:
+                records.extend(json.loads(line) for line in f if line.strip())
+    return records
+
+
+def latency_table(records: list[dict]) -> dict[str, dict]:
+    durations = defaultdict(list)
+    for record in records:
+        key = "LLM" if record["type"] == "llm" else record["name"]
+        durations[key].append(record["duration_seconds"])
+    return {
+        key: {
+            "calls": len(values),
+            "total_seconds": round(sum(values), 4),
+            "p50_seconds": round(statistics.median(values), 4),
+            "max_seconds": round(max(values), 4),
+        }
+        for key, values in sorted(durations.items())
+    }
+
+
+def max_rss_mb() -> float | None:
+    try:
+        import resource
+    except ImportError:
+        return None
+    # ru_maxrss is in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def main():
+    import argparse
+    parser = argparse.ArgumentParser(description="Offline end-to-end benchmark of check_for_tasks.py and ai_agent_runner.py.")
+    parser.add_argument("--sample", default="todo_app", help="Sample codebase under benchmarks/sample_codebases (default: todo_app)")
+    parser.add_argument("--work-items", type=int, default=4, help="Number of tagged work items to create (default: 4)")
+    parser.add_argument("--batch-size", type=int, help="Work items claimed per check_for_tasks run (default: all)")
+    parser.add_argument("--workers", type=int, default=1, help="ai_agent_runner --workers (default: 1)")
+    parser.add_argument("--llm-latency", type=float, default=0.0, help="Seconds the scripted model sleeps per call (default: 0)")
+    parser.add_argument("--ado-latency", type=float, default=0.0, help="Seconds the fake Azure DevOps server sleeps per request (default: 0)")
+    parser.add_argument("--throttle-every", type=int, default=0, help="Make every n-th Azure DevOps request return 429 (default: never)")
+    parser.add_argument("--trace-memory", action="store_true", help="Track peak Python heap usage with tracemalloc (slower)")
+    parser.add_argument("--verbose", action="store_true", help="Show the output of the runner and the agent")
+    parser.add_argument("--json", help="Also write the report as JSON to this file")
+    args = parser.parse_args()
+
+    fake = FakeAzureDevOps(latency=args.ado_latency, throttle_every=args.throttle_every).start()
+    for i in range(args.work_items):
+        fake.add_work_item(f"Benchmark feature {i + 1}", description="Add a helper that returns the pending todos.")
+    workspace = tempfile.mkdtemp(prefix="ai-developer-benchmark-")
+    os.environ.update(GIT_IDENTITY)
+    codebase_path = prepare_codebase(args.sample, workspace)
+    os.environ.update({
+        "AZURE_DEVOPS_BASE_URL": fake.url,
+        "AZURE_DEVOPS_ORG": "benchmark",
+        "AZURE_DEVOPS_PROJECT": "benchmark",
+        "AZURE_DEVOPS_PAT": "benchmark-pat",
+        "AZURE_DEVOPS_REPO_ID": "benchmark-repo",
+        "AI_DEVELOPER_LLM_FACTORY": "benchmarks.scripted_llm:create_chat_model",
+        "AI_DEVELOPER_SCRIPTED_LLM_LATENCY": str(args.llm_latency),
+        "AI_DEVELOPER_CACHE_DIR": os.path.join(workspace, "cache"),
+        "AI_DEVELOPER_TRACE_DIR": os.path.join(workspace, "traces"),
+    })
+    cwd = os.getcwd()
+    os.chdir(workspace)
+    try:
+        # The entry points read their configuration at import time
+        import ai_agent_runner
+        import check_for_tasks
+        from agent.azure_devops_client import get_client
+
+        if args.trace_memory:
+            tracemalloc.start()
+        output = io.StringIO()
+        redirect = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(output)
+        timings = {}
+        with redirect:
+            start = time.perf_counter()
+            check_exit = run_main(check_for_tasks.main, ["check_for_tasks.py", "--batch-size", str(args.batch_size or args.work_items)])
+            timings["check_for_tasks"] = time.perf_counter() - start
+            start = time.perf_counter()
+            runner_exit = run_main(ai_agent_runner.main, [
+                "ai_agent_runner.py",
+                "--queue-file", "task_queue.jsonl",
+                "--codebase-path", codebase_path,
+                "--workers", str(args.workers),
+            ])
+            timings["ai_agent_runner"] = time.perf_counter() - start
+        peak_heap = tracemalloc.get_traced_memory()[1] if args.trace_memory else None
+        if args.trace_memory:
+            tracemalloc.stop()
+        records = read_traces(os.environ["AI_DEVELOPER_TRACE_DIR"])
+        report = {
+            "work_items": args.work_items,
+            "workers": args.workers,
+            "exit_codes": {"check_for_tasks": check_exit, "ai_agent_runner": runner_exit},
+            "wall_seconds": {phase: round(seconds, 3) for phase, seconds in timings.items()},
+            "pull_requests": len(fake.pull_requests),
+            "comments": sum(len(c) for c in fake.comments.values()),
+            "server_requests": dict(sorted(fake.request_counts.items())),
+            "client_metrics": get_client().metrics(),
+            "latencies": latency_table(records),
+            "tokens": sum(r.get("total_tokens", 0) for r in records if r["type"] == "llm"),
+            "peak_heap_mb": round(peak_heap / 1024 / 1024, 1) if peak_heap is not None else None,
+            "max_rss_mb": round(max_rss_mb(), 1) if max_rss_mb() is not None else None,
+        }
+    finally:
+        os.chdir(cwd)
+        fake.stop()
+        shutil.rmtree(workspace, ignore_errors=True)
+
+    print(f"Work items: {report['work_items']}, workers: {report['workers']}, exit codes: {report['exit_codes']}")
+    print(f"Wall time: check_for_tasks {report['wall_seconds']['check_for_tasks']:.3f}s, "
+          f"ai_agent_runner {report['wall_seconds']['ai_agent_runner']:.3f}s")
+    print(f"Pull requests created: {report['pull_requests']}, comments added: {report['comments']}, tokens: {report['tokens']}")
+    print("Azure DevOps requests (server side):")
+    for name, count in report["server_requests"].items():
+        print(f"  {count:>5}  {name}")
+    retries = sum(m["retries"] for m in report["client_metrics"].values())
+    print(f"Client retries: {retries}")
+    print("Latencies:")
+    print(f"  {'call':<36} {'calls':>5} {'total s':>8} {'p50 s':>7} {'max s':>7}")
+    for name, entry in report["latencies"].items():
+        print(f"  {name:<36} {entry['calls']:>5} {entry['total_seconds']:>8.3f} {entry['p50_seconds']:>7.3f} {entry['max_seconds']:>7.3f}")
+    memory = f"max RSS {report['max_rss_mb']} MB" if report["max_rss_mb"] is not None else "max RSS n/a"
+    if report["peak_heap_mb"] is not None:
+        memory += f", peak Python heap {report['peak_heap_mb']} MB"
+    print(f"Memory: {memory}")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    if check_exit or runner_exit:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
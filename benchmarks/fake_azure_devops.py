@@ -0,0 +1,234 @@
+"""
+Local stand-in for the Azure DevOps REST endpoints used by the agent: WIQL,
+work items (single, batch and JSON Patch updates), comments, tags and pull
+requests.
+
+Point the agent at it with AZURE_DEVOPS_BASE_URL=http://127.0.0.1:<port>.
+"""
+import json
+import re
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import unquote, urlparse
+
+ROUTES = [
+    ("POST", r"/_apis/wit/wiql", "wiql"),
+    ("POST", r"/_apis/wit/workitemsbatch", "work_items_batch"),
+    ("GET", r"/_apis/wit/workitems/(?P<id>\d+)", "get_work_item"),
+    ("PATCH", r"/_apis/wit/workitems/(?P<id>\d+)", "update_work_item"),
+    ("POST", r"/_apis/wit/workitems/(?P<id>\d+)/comments", "add_comment"),
+    ("DELETE", r"/_apis/wit/tags/(?P<tag>[^/]+)", "delete_tag"),
+    ("POST", r"/_apis/git/repositories/(?P<repo>[^/]+)/pullrequests", "create_pull_request"),
+    ("PUT", r"/_apis/git/repositories/(?P<repo>[^/]+)/pullrequests/(?P<pr>\d+)/workitems/(?P<id>\d+)", "link_work_item"),
+    ("PATCH", r"/_apis/git/repositories/(?P<repo>[^/]+)/pullrequests/(?P<pr>\d+)/autocomplete", "set_auto_complete"),
+]
+_COMPILED_ROUTES = [(method, re.compile(f"^/[^/]+/[^/]+{pattern}$", re.IGNORECASE), name) for method, pattern, name in ROUTES]
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat(timespec="milliseconds").replace("+00:00", "Z")
+
+
+def _tags(fields: dict) -> list[str]:
+    return [t.strip() for t in fields.get("System.Tags", "").split(";") if t.strip()]
+
+
+def _compare(fields: dict, field: str, op: str, value: str) -> bool:
+    if field == "System.TeamProject":
+        return True  # The fake serves a single project
+    actual = fields.get(field)
+    if actual is None:
+        return False
+    if field.endswith("Date"):
+        actual, value = datetime.fromisoformat(actual), datetime.fromisoformat(value)
+    return {"=": actual == value, "<>": actual != value, "<": actual < value,
+            "<=": actual <= value, ">": actual > value, ">=": actual >= value}[op]
+
+
+def wiql_condition(query: str) -> str:
+    """
+    Translates the WHERE clause of the WIQL queries used by check_for_tasks.py
+    into a Python expression over the work item's fields.
+    """
+    where = re.search(r"\bWHERE\b(.*?)(?:\bORDER BY\b|$)", query, re.DOTALL).group(1)
+    where = re.sub(r"\[System\.Tags\] CONTAINS '([^']*)'", lambda m: f"({m.group(1)!r} in _tags(fields))", where)
+    where = re.sub(
+        r"\[([\w.]+)\] (>=|<=|<>|=|<|>) '([^']*)'",
+        lambda m: f"_compare(fields, {m.group(1)!r}, {m.group(2)!r}, {m.group(3)!r})",
+        where,
+    )
+    # Parenthesized so that the clause may span lines
+    return f"({re.sub(r'\bAND\b', 'and', re.sub(r'\bOR\b', 'or', where)).strip()})"
+
+
+class FakeAzureDevOps:
+    """
+    In-memory Azure DevOps project served over HTTP on 127.0.0.1.
+
+    latency adds a fixed delay to every response, and throttle_every makes
+    every n-th request return 429 with Retry-After: 0 to exercise retries.
+    """
+
+    def __init__(self, latency: float = 0.0, throttle_every: int = 0):
+        self.latency = latency
+        self.throttle_every = throttle_every
+        self.work_items: dict[int, dict] = {}
+        self.comments: dict[int, list[str]] = {}
+        self.pull_requests: dict[int, dict] = {}
+        self.history: dict[int, list[str]] = {}
+        self.request_counts: Counter = Counter()
+        self.throttled = 0
+        self._requests = 0
+        self._lock = threading.Lock()
+        self._server = None
+
+    def add_work_item(self, title: str, description: str = "", tags: str = "AI Developer", state: str = "To Do") -> int:
+        with self._lock:
+            work_item_id = len(self.work_items) + 1
+            now = _now()
+            self.work_items[work_item_id] = {
+                "id": work_item_id,
+                "rev": 1,
+                "fields": {
+                    "System.Id": work_item_id,
+                    "System.Title": title,
+                    "System.Description": description,
+                    "System.Tags": tags,
+                    "System.State": state,
+                    "System.CreatedDate": now,
+                    "System.ChangedDate": now,
+                    "Microsoft.VSTS.Common.Priority": 2,
+                },
+            }
+            return work_item_id
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self._server.server_port}"
+
+    def start(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # Keep-alive, so connection reuse is measurable
+
+            def log_message(self, format, *args):
+                pass
+
+            def _handle(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                body = json.loads(self.rfile.read(length)) if length else None
+                status, payload = fake.dispatch(self.command, urlparse(self.path).path, body)
+                data = json.dumps(payload).encode() if payload is not None else b""
+                self.send_response(status)
+                if status == 429:
+                    self.send_header("Retry-After", "0")
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            do_GET = do_POST = do_PUT = do_PATCH = do_DELETE = _handle
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+
+    def dispatch(self, method: str, path: str, body) -> tuple[int, object]:
+        if self.latency:
+            time.sleep(self.latency)
+        path = unquote(path)
+        for route_method, pattern, name in _COMPILED_ROUTES:
+            match = pattern.match(path)
+            if route_method == method and match:
+                with self._lock:
+                    self._requests += 1
+                    if self.throttle_every and self._requests % self.throttle_every == 0:
+                        self.throttled += 1
+                        self.request_counts[f"{name} (throttled)"] += 1
+                        return 429, {"message": "Too many requests"}
+                    self.request_counts[name] += 1
+                    return getattr(self, f"_{name}")(body, **match.groupdict())
+        with self._lock:
+            self.request_counts[f"unknown {method} {path}"] += 1
+        return 404, {"message": f"No fake route for {method} {path}"}
+
+    def _wiql(self, body):
+        query = body["query"]
+        condition = compile(wiql_condition(query), "<wiql>", "eval")
+        items = [
+            work_item for work_item in self.work_items.values()
+            if eval(condition, {"__builtins__": {}, "_tags": _tags, "_compare": _compare, "fields": work_item["fields"]})
+        ]
+        order = "System.ChangedDate" if "ORDER BY [System.ChangedDate]" in query else "System.CreatedDate"
+        items.sort(key=lambda item: (item["fields"][order], item["id"]))
+        return 200, {"workItems": [{"id": item["id"], "url": ""} for item in items]}
+
+    def _work_items_batch(self, body):
+        fields = body.get("fields")
+        value = []
+        for work_item_id in body["ids"]:
+            work_item = self.work_items.get(int(work_item_id))
+            if work_item is None:
+                value.append(None)
+                continue
+            selected = {k: v for k, v in work_item["fields"].items() if not fields or k in fields}
+            value.append({"id": work_item["id"], "rev": work_item["rev"], "fields": selected})
+        return 200, {"count": len(value), "value": value}
+
+    def _get_work_item(self, body, id):
+        work_item = self.work_items.get(int(id))
+        if work_item is None:
+            return 404, {"message": f"Work item {id} does not exist"}
+        return 200, work_item
+
+    def _update_work_item(self, body, id):
+        work_item = self.work_items.get(int(id))
+        if work_item is None:
+            return 404, {"message": f"Work item {id} does not exist"}
+        for operation in body:
+            if operation["op"] == "test" and operation["path"] == "/rev" and operation["value"] != work_item["rev"]:
+                return 412, {"message": f"The test operation failed: work item {id} is at rev {work_item['rev']}"}
+        for operation in body:
+            if operation["op"] in ("add", "replace") and operation["path"].startswith("/fields/"):
+                field = operation["path"][len("/fields/"):]
+                if field == "System.History":
+                    self.history.setdefault(int(id), []).append(operation["value"])
+                else:
+                    work_item["fields"][field] = operation["value"]
+        work_item["rev"] += 1
+        work_item["fields"]["System.ChangedDate"] = _now()
+        return 200, work_item
+
+    def _add_comment(self, body, id):
+        self.comments.setdefault(int(id), []).append(body["text"])
+        return 200, {"id": len(self.comments[int(id)]), "workItemId": int(id), "text": body["text"]}
+
+    def _delete_tag(self, body, tag):
+        for work_item in self.work_items.values():
+            tags = [t.strip() for t in work_item["fields"].get("System.Tags", "").split(";") if t.strip()]
+            if tag in tags:
+                work_item["fields"]["System.Tags"] = "; ".join(t for t in tags if t != tag)
+        return 204, None
+
+    def _create_pull_request(self, body, repo):
+        pr_id = len(self.pull_requests) + 1
+        self.pull_requests[pr_id] = {"pullRequestId": pr_id, "repository": repo, "workItems": [], "autoComplete": False, **body}
+        return 201, {"pullRequestId": pr_id, "url": f"{self.url}/pullrequests/{pr_id}"}
+
+    def _link_work_item(self, body, repo, pr, id):
+        self.pull_requests[int(pr)]["workItems"].append(int(id))
+        return 200, {}
+
+    def _set_auto_complete(self, body, repo, pr):
+        self.pull_requests[int(pr)]["autoComplete"] = True
+        return 200, {"pullRequestId": int(pr)}
@@ -0,0 +1,104 @@
+"""
+Replay check for the response cache (agent/response_cache.py).
+
+Records one agent run with the scripted chat model on a fresh checkout of a
+sample codebase, then replays it on another fresh checkout at the same path
+with AI_DEVELOPER_RESPONSE_CACHE=replay, both against a local fake Azure
+DevOps server. The replay has to serve every LLM call from the cache without
+sending any request to Azure DevOps; the script exits with an error otherwise.
+
+    python benchmarks/replay_check.py
+"""
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SAMPLE_CODEBASES = os.path.join(REPO_ROOT, "benchmarks", "sample_codebases")
+sys.path.insert(0, REPO_ROOT)
+
+from benchmarks.fake_azure_devops import FakeAzureDevOps  # noqa: E402
+
+GIT_IDENTITY = {
+    "GIT_AUTHOR_NAME": "AI Developer Benchmark",
+    "GIT_AUTHOR_EMAIL": "benchmark@example.com",
+    "GIT_COMMITTER_NAME": "AI Developer Benchmark",
+    "GIT_COMMITTER_EMAIL": "benchmark@example.com",
+}
+
+
+def checkout(sample: str, codebase_path: str):
+    # Plain copies get new modification times, like a fresh clone
+    shutil.rmtree(codebase_path, ignore_errors=True)
+    shutil.copytree(os.path.join(SAMPLE_CODEBASES, sample), codebase_path, copy_function=shutil.copy)
+    for command in (["git", "init", "-q", "-b", "main"], ["git", "add", "-A"], ["git", "commit", "-q", "-m", "Initial commit"]):
+        subprocess.run(command, cwd=codebase_path, check=True, capture_output=True)
+
+
+def run_agent(codebase_path: str, mode: str) -> tuple[int, int]:
+    """
+    Runs the agent on one work item and returns its LLM cache (hits, misses).
+    """
+    from agent.developer import DeveloperAgent
+    agent = DeveloperAgent(
+        codebase_path=codebase_path,
+        azure_devops_org=os.environ["AZURE_DEVOPS_ORG"],
+        azure_devops_project=os.environ["AZURE_DEVOPS_PROJECT"],
+        azure_devops_repo_id=os.environ["AZURE_DEVOPS_REPO_ID"],
+        azure_devops_pat=os.environ["AZURE_DEVOPS_PAT"],
+        shell_cwd=codebase_path,
+        response_cache=mode,
+    )
+    agent.develop_feature(f"Azure DevOps Work Item ID: 1\nPlease implement the feature in the codebase located at {codebase_path}.")
+    return agent.llm_cache.hits, agent.llm_cache.misses
+
+
+def main():
+    import argparse
+    parser = argparse.ArgumentParser(description="Check that a recorded agent run replays from the response cache.")
+    parser.add_argument("--sample", default="todo_app", help="Sample codebase in benchmarks/sample_codebases (default: todo_app)")
+    args = parser.parse_args()
+
+    fake = FakeAzureDevOps().start()
+    fake.add_work_item("Replay check feature")
+    workspace = tempfile.mkdtemp(prefix="ai-developer-replay-")
+    try:
+        os.environ.update(GIT_IDENTITY)
+        os.environ.update({
+            "AZURE_DEVOPS_BASE_URL": fake.url,
+            "AZURE_DEVOPS_ORG": "benchmark",
+            "AZURE_DEVOPS_PROJECT": "benchmark",
+            "AZURE_DEVOPS_PAT": "benchmark-pat",
+            "AZURE_DEVOPS_REPO_ID": "benchmark-repo",
+            "AI_DEVELOPER_LLM_FACTORY": "benchmarks.scripted_llm:create_chat_model",
+            "AI_DEVELOPER_CACHE_DIR": os.path.join(workspace, "cache"),
+        })
+        codebase_path = os.path.join(workspace, args.sample)
+        checkout(args.sample, codebase_path)
+        _, recorded = run_agent(codebase_path, "on")
+        recorded_requests = sum(fake.request_counts.values())
+        checkout(args.sample, codebase_path)
+        try:
+            hits, misses = run_agent(codebase_path, "replay")
+        except RuntimeError as e:
+            print(f"FAIL: {e}")
+            sys.exit(1)
+        replayed_requests = sum(fake.request_counts.values()) - recorded_requests
+    finally:
+        fake.stop()
+        shutil.rmtree(workspace, ignore_errors=True)
+    print(f"Recorded {recorded} LLM calls, replayed {hits} from the cache ({misses} misses)")
+    print(f"Azure DevOps requests: {recorded_requests} while recording, {replayed_requests} during the replay")
+    if not recorded or misses or hits != recorded:
+        print("FAIL: the replay didn't serve every LLM call from the cache")
+        sys.exit(1)
+    if not recorded_requests or replayed_requests:
+        print("FAIL: the replay sent requests to Azure DevOps")
+        sys.exit(1)
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
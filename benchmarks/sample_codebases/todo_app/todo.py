@@ -0,0 +1,28 @@
+"""Minimal in-memory todo list."""
+from dataclasses import dataclass, field
+
+
+@dataclass
+class Todo:
+    title: str
+    done: bool = False
+
+
+@dataclass
+class TodoList:
+    todos: list[Todo] = field(default_factory=list)
+
+    def add(self, title: str) -> Todo:
+        todo = Todo(title)
+        self.todos.append(todo)
+        return todo
+
+    def complete(self, title: str):
+        for todo in self.todos:
+            if todo.title == title:
+                todo.done = True
+                return
+        raise KeyError(title)
+
+    def pending(self) -> list[Todo]:
+        return [todo for todo in self.todos if not todo.done]
@@ -0,0 +1,20 @@
+import unittest
+
+from todo import TodoList
+
+
+class TodoListTest(unittest.TestCase):
+    def test_complete_removes_from_pending(self):
+        todos = TodoList()
+        todos.add("write code")
+        todos.add("review code")
+        todos.complete("write code")
+        self.assertEqual([todo.title for todo in todos.pending()], ["review code"])
+
+    def test_complete_unknown_raises(self):
+        with self.assertRaises(KeyError):
+            TodoList().complete("missing")
+
+
+if __name__ == "__main__":
+    unittest.main()
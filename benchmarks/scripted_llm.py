@@ -0,0 +1,120 @@
+"""
+Deterministic chat model that stands in for AzureChatOpenAI in the offline
+benchmarks. It plays a fixed developer script (index the codebase, read files,
+write a feature, run the tests, commit, open a pull request, comment) and
+picks the next turn from the number of assistant turns already in the prompt.
+
+Plug it into DeveloperAgent with
+AI_DEVELOPER_LLM_FACTORY=benchmarks.scripted_llm:create_chat_model.
+"""
+import json
+import os
+import re
+import time
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage, HumanMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+
+def _approximate_tokens(text: str) -> int:
+    return len(text) // 4 + 1
+
+
+class ScriptedChatModel(BaseChatModel):
+    latency: float = 0.0  # Seconds to sleep per call, to simulate model latency
+    tool_names: list[str] = []
+
+    @property
+    def _llm_type(self) -> str:
+        return "scripted"
+
+    def bind_tools(self, tools, **kwargs):
+        names = [getattr(tool, "name", None) or tool.get("name") for tool in tools]
+        return self.model_copy(update={"tool_names": names})
+
+    def _script(self, work_item_id: str, codebase_path: str) -> list[list[dict]]:
+        feature_file = f"features/work_item_{work_item_id}.py"
+        turns = [
+            [{"name": "codebase_index", "args": {"include_summaries": True}}],
+            [
+                {"name": "read_file", "args": {"file_path": "todo.py"}},
+                {"name": "read_file", "args": {"file_path": "README.md"}},
+                {"name": "read_file", "args": {"file_path": "todo_checks.py"}},
+            ],
+            [{"name": "write_file", "args": {
+                "file_path": feature_file,
+                "text": (
+                    f'"""Feature for work item {work_item_id}."""\n\n\n'
+                    f"def work_item_{work_item_id}(todos):\n"
+                    "    return [todo for todo in todos if not todo.done]\n"
+                ),
+            }}],
+            [{"name": "run_shell_command", "args": {"command": "python -m unittest -q todo_checks", "cwd": codebase_path}}],
+            [{"name": "run_shell_command", "args": {
+                "command": f"git checkout -q -b ai/work-item-{work_item_id} && git add -A && git commit -q -m 'Implement work item {work_item_id}'",
+                "cwd": codebase_path,
+            }}],
+            [{"name": "create_azure_devops_pull_request", "args": {
+                "source_branch": f"ai/work-item-{work_item_id}",
+                "target_branch": "main",
+                "title": f"Implement work item {work_item_id}",
+                "description": f"Implements #{work_item_id}",
+                "work_item_id": int(work_item_id),
+                "auto_complete": True,
+            }}],
+            [{"name": "add_azure_devops_work_item_comment", "args": {
+                "work_item_id": work_item_id,
+                "comment": f"Implemented in `{feature_file}`, see the pull request.",
+            }}],
+        ]
+        # Skip the calls whose tools aren't bound, e.g. the PR tool without a repository ID
+        return [
+            [call for call in turn if call["name"] in self.tool_names] for turn in turns
+            if any(call["name"] in self.tool_names for call in turn)
+        ]
+
+    def _generate(self, messages: list[BaseMessage], stop=None, run_manager=None, **kwargs) -> ChatResult:
+        if self.latency:
+            time.sleep(self.latency)
+        specification = next((m.content for m in messages if isinstance(m, HumanMessage)), "")
+        work_item_match = re.search(r"Work Item ID: (\d+)", specification)
+        work_item_id = work_item_match.group(1) if work_item_match else "0"
+        codebase_match = re.search(r"codebase located at (\S+?)\.?\s*$", specification, re.MULTILINE)
+        codebase_path = codebase_match.group(1) if codebase_match else "."
+        turn = sum(1 for m in messages if isinstance(m, AIMessage))
+        script = self._script(work_item_id, codebase_path)
+        if turn < len(script):
+            tool_calls = [
+                {"name": call["name"], "args": call["args"], "id": f"call_{work_item_id}_{turn}_{i}", "type": "tool_call"}
+                for i, call in enumerate(script[turn])
+            ]
+            message = AIMessage(content="", tool_calls=tool_calls)
+            output_text = str(tool_calls)
+        else:
+            message = AIMessage(content=f"Implemented work item {work_item_id} and opened a pull request.")
+            output_text = message.content
+        input_tokens = sum(_approximate_tokens(str(m.content)) for m in messages)
+        output_tokens = _approximate_tokens(output_text)
+        message.usage_metadata = {
+            "input_tokens": input_tokens,
+            "output_tokens": output_tokens,
+            "total_tokens": input_tokens + output_tokens,
+        }
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _stream(self, messages: list[BaseMessage], stop=None, run_manager=None, **kwargs):
+        # AgentExecutor streams the model like it does AzureChatOpenAI, as one chunk here
+        message = self._generate(messages, stop, run_manager, **kwargs).generations[0].message
+        yield ChatGenerationChunk(message=AIMessageChunk(
+            content=message.content,
+            tool_call_chunks=[
+                {"name": call["name"], "args": json.dumps(call["args"]), "id": call["id"], "index": i, "type": "tool_call_chunk"}
+                for i, call in enumerate(message.tool_calls)
+            ],
+            usage_metadata=message.usage_metadata,
+        ))
+
+
+def create_chat_model() -> ScriptedChatModel:
+    return ScriptedChatModel(latency=float(os.environ.get("AI_DEVELOPER_SCRIPTED_LLM_LATENCY", "0")))
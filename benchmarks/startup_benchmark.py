@@ -0,0 +1,106 @@
+"""
+Startup benchmark for ai_agent_runner.py.
+
+Runs the cheap entry points (no work item, --help) under `python -X importtime`,
+reports wall time above a bare interpreter start and the slowest imports, and
+with --check fails when the agent stack is imported or the time budget is exceeded.
+
+    python benchmarks/startup_benchmark.py --check
+"""
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCENARIOS = {
+    "no work item": ["ai_agent_runner.py", "0"],
+    "--help": ["ai_agent_runner.py", "--help"],
+}
+# None of these may be imported before there is actual work to do
+FORBIDDEN_MODULES = [
+    "langchain",
+    "langchain_core",
+    "langchain_community",
+    "langchain_openai",
+    "openai",
+    "pydantic",
+    "requests",
+]
+DEFAULT_BUDGET_MS = 150.0  # Allowed wall time above a bare `python -c pass`
+
+
+def run_timed(args):
+    start = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", *args],
+        cwd=REPO_ROOT,
+        capture_output=True,
+        text=True,
+        timeout=120
+    )
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    if result.returncode != 0:
+        raise RuntimeError(f"{' '.join(args)} exited with {result.returncode}: {result.stderr[-2000:]}")
+    return elapsed_ms, parse_importtime(result.stderr)
+
+
+def parse_importtime(stderr):
+    """
+    Returns {module: cumulative microseconds} from `-X importtime` output.
+    """
+    imports = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        # Format: "import time: <self us> | <cumulative us> | <indented module name>"
+        _, cumulative_us, name = line[len("import time:"):].split("|")
+        imports[name.strip()] = int(cumulative_us)
+    return imports
+
+
+def median_run(args, repeat):
+    times = []
+    imports = {}
+    for _ in range(repeat):
+        elapsed_ms, imports = run_timed(args)
+        times.append(elapsed_ms)
+    return statistics.median(times), imports
+
+
+def main():
+    import argparse
+    parser = argparse.ArgumentParser(description="Measure ai_agent_runner.py startup time.")
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per scenario, the median is reported (default: 5)")
+    parser.add_argument("--budget-ms", type=float, default=DEFAULT_BUDGET_MS, help=f"Allowed milliseconds above bare interpreter startup (default: {DEFAULT_BUDGET_MS})")
+    parser.add_argument("--top", type=int, default=10, help="Number of slowest imports to list (default: 10)")
+    parser.add_argument("--check", action="store_true", help="Exit with an error if a scenario imports the agent stack or exceeds the budget")
+    args = parser.parse_args()
+
+    baseline_ms, baseline_imports = median_run(["-c", "pass"], args.repeat)
+    print(f"Bare interpreter startup: {baseline_ms:.1f} ms")
+    problems = []
+    for scenario, scenario_args in SCENARIOS.items():
+        elapsed_ms, imports = median_run(scenario_args, args.repeat)
+        overhead_ms = elapsed_ms - baseline_ms
+        print(f"\n{scenario}: {elapsed_ms:.1f} ms ({overhead_ms:+.1f} ms over bare startup)")
+        own_imports = {name: us for name, us in imports.items() if name not in baseline_imports}
+        for name, us in sorted(own_imports.items(), key=lambda item: item[1], reverse=True)[:args.top]:
+            print(f"  {us / 1000:8.1f} ms  {name}")
+        forbidden = [name for name in FORBIDDEN_MODULES if name in imports]
+        if forbidden:
+            problems.append(f"{scenario}: imports {', '.join(forbidden)}")
+        if overhead_ms > args.budget_ms:
+            problems.append(f"{scenario}: {overhead_ms:.1f} ms over bare startup exceeds budget of {args.budget_ms:.1f} ms")
+
+    if problems:
+        print("\nStartup regressions:")
+        for problem in problems:
+            print(f"  {problem}")
+        if args.check:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,9 @@
+import json
 import os
-import requests
+import socket
+from datetime import datetime, timedelta, timezone
+
+from agent.azure_devops_client import azure_devops_base_url, get_client
 
 # Configuration (set these as environment variables in your pipeline)
 AZURE_DEVOPS_ORG = os.environ.get("AZURE_DEVOPS_ORG")
@@ -7,20 +11,58 @@ AZURE_DEVOPS_PROJECT = os.environ.get("AZURE_DEVOPS_PROJECT")
 AZURE_DEVOPS_PAT = os.environ.get("AZURE_DEVOPS_PAT")  # Personal Access Token
 AI_DEVELOPER_TAG = "AI Developer"  # Tag used to identify work items for the agent
 WORK_ITEM_STATUS = "To Do"  # Status to filter work items
+# Claimed items move to this state (and to AI_DEVELOPER_ASSIGNEE if set) until the agent is done
+IN_PROGRESS_STATUS = os.environ.get("AI_DEVELOPER_IN_PROGRESS_STATE", "Doing")
+AI_DEVELOPER_ASSIGNEE = os.environ.get("AI_DEVELOPER_ASSIGNEE")
+# A claimed item that hasn't changed for this long is considered abandoned by a
+# crashed runner and can be claimed again. Runners renew it before starting an item.
+CLAIM_LEASE_SECONDS = int(os.environ.get("AI_DEVELOPER_LEASE_SECONDS", "1800"))
+RUNNER_ID = os.environ.get("AI_DEVELOPER_RUNNER_ID") or os.environ.get("BUILD_BUILDID") or f"{socket.gethostname()}-{os.getpid()}"
+CONFLICT_STATUS_CODES = {409, 412}  # A failed JSON Patch "test" on /rev
+CLAIM_CANDIDATES_FACTOR = 2
+WORK_ITEM_FIELDS = [
+    "System.Id",
+    "System.Title",
+    "System.Description",
+    "System.Tags",
+    "System.State",
+    "System.ChangedDate",
+    "Microsoft.VSTS.Common.Priority",
+]
+WORK_ITEMS_BATCH_LIMIT = 200  # Maximum number of IDs accepted by the workitemsbatch API
+TASK_ID_FILE = "task_id.txt"
+TASK_QUEUE_FILE = "task_queue.jsonl"
 
-def get_next_work_item():
-    url = f"https://dev.azure.com/{AZURE_DEVOPS_ORG}/{AZURE_DEVOPS_PROJECT}/_apis/wit/wiql?api-version=7.0"
+
+def query_work_item_ids(limit=None, changed_since=None):
+    """
+    Returns the IDs of work items waiting for the agent, and of claimed items
+    whose lease has expired. With changed_since (an ISO 8601 timestamp) only
+    waiting items changed at or after it are returned, oldest change first,
+    so the caller can use it as a watermark.
+    """
+    # timePrecision makes WIQL compare the time of day, not just the date
+    url = f"{azure_devops_base_url()}/{AZURE_DEVOPS_ORG}/{AZURE_DEVOPS_PROJECT}/_apis/wit/wiql?api-version=7.0&timePrecision=true"
+    if limit:
+        url += f"&$top={limit}"
+    changed_filter = f"AND [System.ChangedDate] >= '{changed_since}'" if changed_since else ""
+    lease_cutoff = (datetime.now(timezone.utc) - timedelta(seconds=CLAIM_LEASE_SECONDS)).strftime("%Y-%m-%dT%H:%M:%SZ")
+    order_by = "[System.ChangedDate] ASC" if changed_since else "[System.CreatedDate] ASC"
     query = {
         "query": f"""
         SELECT [System.Id], [System.Title]
         FROM WorkItems
         WHERE [System.TeamProject] = '{AZURE_DEVOPS_PROJECT}'
           AND [System.Tags] CONTAINS '{AI_DEVELOPER_TAG}'
-          AND [System.State] = '{WORK_ITEM_STATUS}'
-        ORDER BY [System.CreatedDate] ASC
+          AND (
+            ([System.State] = '{WORK_ITEM_STATUS}' {changed_filter})
+            OR ([System.State] = '{IN_PROGRESS_STATUS}' AND [System.ChangedDate] < '{lease_cutoff}')
+          )
+        ORDER BY {order_by}
         """
     }
-    response = requests.post(
+    client = get_client()
+    response = client.post(
         url,
         json=query,
         auth=("", AZURE_DEVOPS_PAT)
@@ -30,29 +72,192 @@ def get_next_work_item():
     print(f"Raw JSON response: {response.text}")
     work_items = response.json().get("workItems", [])
     print(f"Found {len(work_items)} new work items.")
-    if not work_items:
-        print("No new work items found. Setting task ID to 0.")
-        return 0  # No new work items
-    print(f"Next work item ID: {work_items[0]['id']}")
-    
-    # Remove the AI_DEVELOPER_TAG from the project using the DELETE method and the correct tag API
-    tag_delete_url = f"https://dev.azure.com/{AZURE_DEVOPS_ORG}/{AZURE_DEVOPS_PROJECT}/_apis/wit/tags/{AI_DEVELOPER_TAG}?api-version=7.2-preview.1"
+    ids = [work_item["id"] for work_item in work_items]
+    return ids[:limit] if limit else ids
+
+
+def get_work_items_batch(work_item_ids):
+    # Fetch the fields of all work items with as few round trips as possible
+    url = f"{azure_devops_base_url()}/{AZURE_DEVOPS_ORG}/{AZURE_DEVOPS_PROJECT}/_apis/wit/workitemsbatch?api-version=7.0"
+    client = get_client()
+    work_items = []
+    for i in range(0, len(work_item_ids), WORK_ITEMS_BATCH_LIMIT):
+        response = client.post(
+            url,
+            json={
+                "ids": work_item_ids[i:i + WORK_ITEMS_BATCH_LIMIT],
+                "fields": WORK_ITEM_FIELDS,
+                "errorPolicy": "omit",
+            },
+            auth=("", AZURE_DEVOPS_PAT)
+        )
+        response.raise_for_status()
+        # Items that could not be read are returned as null with errorPolicy=omit
+        work_items.extend(item for item in response.json().get("value", []) if item)
+    return work_items
+
+
+def _tags(work_item):
+    return [t.strip() for t in work_item.get("fields", {}).get("System.Tags", "").split(";") if t.strip()]
+
+
+def patch_work_item(work_item_id, rev, operations):
+    """
+    Applies JSON Patch operations to a work item only if it is still at rev.
+    Returns the updated work item, or None if someone else changed it first.
+    """
+    url = f"{azure_devops_base_url()}/{AZURE_DEVOPS_ORG}/{AZURE_DEVOPS_PROJECT}/_apis/wit/workitems/{work_item_id}?api-version=7.0"
     if AZURE_DEVOPS_PAT is None:
         raise ValueError("AZURE_DEVOPS_PAT environment variable is not set.")
-    response = requests.delete(
-        tag_delete_url,
-        auth=("", str(AZURE_DEVOPS_PAT)),
-        timeout=10
+    response = get_client().patch(
+        url,
+        json=[{"op": "test", "path": "/rev", "value": rev}, *operations],
+        headers={"Content-Type": "application/json-patch+json"},
+        auth=("", str(AZURE_DEVOPS_PAT))
     )
+    if response.status_code in CONFLICT_STATUS_CODES:
+        return None
     response.raise_for_status()
-    print(f"Removed tag '{AI_DEVELOPER_TAG}' from project.")
+    return response.json()
+
+
+def _lease_note(action):
+    expires = datetime.now(timezone.utc) + timedelta(seconds=CLAIM_LEASE_SECONDS)
+    return f"AI Developer runner {RUNNER_ID} {action}, lease until {expires.strftime('%Y-%m-%d %H:%M:%S')} UTC."
+
+
+def _apply_update(work_item, updated):
+    # Only the rev and state are taken over, the poller's watermark is based on
+    # the System.ChangedDate from before the claim
+    work_item["rev"] = updated.get("rev", work_item.get("rev"))
+    state = updated.get("fields", {}).get("System.State")
+    if state:
+        work_item.setdefault("fields", {})["System.State"] = state
+
+
+def claim_work_item(work_item):
+    """
+    Claims a work item by moving it to IN_PROGRESS_STATUS, guarded by its rev
+    so that of several runners racing for the same item only one wins.
+    Returns True if this runner got it.
+    """
+    operations = [
+        {"op": "add", "path": "/fields/System.State", "value": IN_PROGRESS_STATUS},
+        {"op": "add", "path": "/fields/System.History", "value": _lease_note("claimed this work item")},
+    ]
+    if AI_DEVELOPER_ASSIGNEE:
+        operations.append({"op": "add", "path": "/fields/System.AssignedTo", "value": AI_DEVELOPER_ASSIGNEE})
+    updated = patch_work_item(work_item["id"], work_item["rev"], operations)
+    if updated is None:
+        print(f"Work item {work_item['id']} was claimed or changed by someone else, skipping it.")
+        return False
+    _apply_update(work_item, updated)
+    work_item["claim"] = {"runner": RUNNER_ID}
+    return True
+
+
+def renew_claim(work_item):
+    """
+    Renews the lease of a claimed work item before the agent starts on it.
+    Returns False if the item changed since it was claimed, e.g. because the
+    lease expired and another runner claimed it.
+    """
+    updated = patch_work_item(work_item["id"], work_item["rev"], [
+        {"op": "add", "path": "/fields/System.History", "value": _lease_note("started working on this work item")},
+    ])
+    if updated is None:
+        print(f"Work item {work_item['id']} changed since it was claimed, skipping it.")
+        return False
+    _apply_update(work_item, updated)
+    return True
+
+
+def complete_claim(work_item, succeeded, detail=None, attempts=3):
+    """
+    Ends the claim by removing the AI Developer tag from the work item, so it
+    isn't picked up again. A failed item is also moved back to WORK_ITEM_STATUS.
+    """
+    for _ in range(attempts):
+        url = f"{azure_devops_base_url()}/{AZURE_DEVOPS_ORG}/{AZURE_DEVOPS_PROJECT}/_apis/wit/workitems/{work_item['id']}?api-version=7.0"
+        response = get_client().get(url, auth=("", AZURE_DEVOPS_PAT))
+        response.raise_for_status()
+        current = response.json()
+        tags = [t for t in _tags(current) if t != AI_DEVELOPER_TAG]
+        note = f"AI Developer runner {RUNNER_ID} {'finished' if succeeded else 'failed'}" + (f": {detail}" if detail else ".")
+        operations = [
+            {"op": "add", "path": "/fields/System.Tags", "value": "; ".join(tags)},
+            {"op": "add", "path": "/fields/System.History", "value": note},
+        ]
+        if not succeeded:
+            operations.append({"op": "add", "path": "/fields/System.State", "value": WORK_ITEM_STATUS})
+        # Retry on a concurrent edit, e.g. a comment added while we read the item
+        if patch_work_item(work_item["id"], current["rev"], operations) is not None:
+            return
+    raise RuntimeError(f"Work item {work_item['id']} kept changing, could not release its claim")
+
+
+def get_next_work_items(batch_size=1, changed_since=None, exclude_ids=()):
+    """
+    Claims up to batch_size work items and returns them with their fields.
+    Items in exclude_ids (e.g. ones already dispatched) are skipped, and so
+    are items another runner claims first.
+    """
+    # Look at more candidates than needed so that runners racing for the
+    # oldest items still fill their batch from the ones after them
+    limit = batch_size * CLAIM_CANDIDATES_FACTOR + len(exclude_ids)
+    work_item_ids = query_work_item_ids(limit=limit, changed_since=changed_since)
+    work_item_ids = [i for i in work_item_ids if i not in exclude_ids]
+    if not work_item_ids:
+        print("No new work items found.")
+        return []
+    work_items = []
+    for work_item in get_work_items_batch(work_item_ids):
+        if len(work_items) >= batch_size:
+            break
+        if claim_work_item(work_item):
+            work_items.append(work_item)
+    print(f"Claimed work items: {', '.join(str(w['id']) for w in work_items) or 'none'}")
+    return work_items
+
+
+def get_next_work_item():
+    work_items = get_next_work_items(batch_size=1)
+    if not work_items:
+        print("No new work items found. Setting task ID to 0.")
+        return 0  # No new work items
+    print(f"Next work item ID: {work_items[0]['id']}")
     return work_items[0]["id"]
 
 
+def write_task_queue(work_items, path=TASK_QUEUE_FILE):
+    with open(path, "w", encoding="utf-8") as f:
+        for work_item in work_items:
+            record = {"id": work_item["id"], "rev": work_item.get("rev"), "fields": work_item.get("fields", {})}
+            if "claim" in work_item:
+                record["claim"] = work_item["claim"]
+            f.write(json.dumps(record) + "\n")
+
+
 def main():
-    work_item_id = get_next_work_item()
-    with open("task_id.txt", "w", encoding="utf-8") as f:
+    import argparse
+    parser = argparse.ArgumentParser(description="Claim work items tagged for the AI Developer Agent.")
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=int(os.environ.get("AI_DEVELOPER_BATCH_SIZE", "1")),
+        help="Maximum number of work items to claim in one run (default: 1, or AI_DEVELOPER_BATCH_SIZE)"
+    )
+    parser.add_argument("--queue-file", default=TASK_QUEUE_FILE, help=f"Path of the JSONL work item queue (default: {TASK_QUEUE_FILE})")
+    args = parser.parse_args()
+
+    work_items = get_next_work_items(batch_size=max(1, args.batch_size))
+    write_task_queue(work_items, args.queue_file)
+    print(f"Wrote {len(work_items)} work items to {args.queue_file}.")
+    # task_id.txt keeps holding the first claimed ID (or 0) so the pipeline can skip empty runs
+    work_item_id = work_items[0]["id"] if work_items else 0
+    with open(TASK_ID_FILE, "w", encoding="utf-8") as f:
         f.write(str(work_item_id))
+    get_client().print_metrics()
 
 
 if __name__ == "__main__":
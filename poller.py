@@ -0,0 +1,114 @@
+import json
+import os
+import signal
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+# Import the agent stack once at startup so dispatching a work item doesn't pay for it
+import agent.developer  # noqa: F401
+from agent.azure_devops_client import get_client
+from agent.workspace import get_workspace_manager
+from ai_agent_runner import run_work_item
+from check_for_tasks import get_next_work_items
+
+POLL_INTERVAL = 30  # Seconds between polls
+STATE_FILE = ".ai-developer-poller.json"
+
+
+def load_state(path=STATE_FILE):
+    if not os.path.exists(path):
+        return {"watermark": None}
+    with open(path, encoding="utf-8") as f:
+        state = json.load(f)
+    state.setdefault("watermark", None)
+    return state
+
+
+def save_state(state, path=STATE_FILE):
+    # Write to a temporary file first so a crash never leaves a truncated state file
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(state, f)
+    os.replace(tmp_path, path)
+
+
+def poll_once(state, capacity, running_ids=()):
+    """
+    Claims up to capacity work items changed since the watermark and advances
+    the watermark to the newest System.ChangedDate among them. Items running
+    in this process are skipped even if their lease has run out.
+    """
+    work_items = get_next_work_items(
+        batch_size=capacity,
+        changed_since=state["watermark"],
+        exclude_ids=set(running_ids),
+    )
+    for work_item in work_items:
+        changed_date = work_item.get("fields", {}).get("System.ChangedDate")
+        # Compare parsed timestamps, fractional seconds make plain string comparison unreliable
+        if changed_date and (
+            state["watermark"] is None
+            or datetime.fromisoformat(changed_date) > datetime.fromisoformat(state["watermark"])
+        ):
+            state["watermark"] = changed_date
+    return work_items
+
+
+def main():
+    import argparse
+    parser = argparse.ArgumentParser(description="Keep polling Azure DevOps and run the AI Developer Agent on new work items.")
+    parser.add_argument("--codebase-path", default="codebase", help="Path to the codebase directory, or a git URL to check out from the workspace cache (default: codebase)")
+    parser.add_argument("--workers", type=int, default=1, help="Number of work items to process concurrently, each on its own git worktree (default: 1)")
+    parser.add_argument("--interval", type=float, default=POLL_INTERVAL, help=f"Seconds between polls (default: {POLL_INTERVAL})")
+    parser.add_argument("--state-file", default=STATE_FILE, help=f"File that stores the polling watermark (default: {STATE_FILE})")
+    parser.add_argument("--once", action="store_true", help="Poll once, wait for dispatched work items and exit")
+    args = parser.parse_args()
+
+    workers = max(1, args.workers)
+    for name, value in get_workspace_manager().package_cache_env().items():
+        os.environ.setdefault(name, value)
+    state = load_state(args.state_file)
+    print(f"Polling every {args.interval}s with {workers} workers, watermark: {state['watermark'] or 'none'}")
+
+    stop = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: stop.set())
+    running = set()
+    running_lock = threading.Lock()
+
+    def dispatch(work_item):
+        try:
+            result = run_work_item(work_item, codebase_path=args.codebase_path, isolated=workers > 1)
+            print(f"Work item {work_item['id']}: {result['status']} in {result['seconds']:.1f}s")
+        finally:
+            with running_lock:
+                running.discard(work_item["id"])
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        try:
+            while not stop.is_set():
+                with running_lock:
+                    capacity = workers - len(running)
+                    running_ids = set(running)
+                if capacity > 0:
+                    try:
+                        work_items = poll_once(state, capacity, running_ids)
+                        save_state(state, args.state_file)
+                    except Exception as e:
+                        # A failed poll is retried on the next tick instead of stopping the daemon
+                        print(f"Polling failed: {e}")
+                        work_items = []
+                    for work_item in work_items:
+                        with running_lock:
+                            running.add(work_item["id"])
+                        executor.submit(dispatch, work_item)
+                if args.once:
+                    break
+                stop.wait(args.interval)
+        except KeyboardInterrupt:
+            print("Stopping, waiting for running work items to finish...")
+    get_client().print_metrics()
+
+
+if __name__ == "__main__":
+    main()